@@ -1,11 +1,22 @@
 import streamlit as st
-import requests
-import json
-import base64
+import os
 import re
 import time
-import pandas as pd
-from bs4 import BeautifulSoup
+import uuid
+from functools import partial
+from types import SimpleNamespace
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import metrics
+from auth_store import AuthStore
+from context_cache import ContextCache
+from question_cache import QuestionCache, content_key
+from gemini_client import CircuitOpenError, GeminiError
+from documents import discard as discard_document, format_size, upload_digest
+from jd_fetcher import JDFetcher
+from scheduler import GenerationScheduler
+from batch import read_results
+from question_gen import (BAR_RAISER_CRITERIA, CATEGORIES, LEVEL_GUIDELINES, context_content, context_key, is_complete, prepare_uploads,
+                          question_cache_key, request_all_questions, request_category_questions)
 
 # --- 1. 디자인 CSS ---
 st.set_page_config(page_title="Bar Raiser Copilot", page_icon="✈️", layout="wide")
@@ -34,24 +45,21 @@ st.markdown("""
 
 # --- 2. 구글 시트 연동 (면접관 인증용) ---
 SHEET_ID = "1c1lZRL0oOC95-YTrqMDpUaCGfbUk368yfYI-XlcJxYo"
-AUTH_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/gviz/tq?tqx=out:csv&sheet=%EB%A9%B4%EC%A0%91%EA%B4%80%20%EC%BD%94%EB%93%9C"
+# BAR_RAISER_AUTH_URL로 다른 시트(또는 벤치마크용 로컬 CSV)를 가리킬 수 있습니다.
+AUTH_URL = os.environ.get("BAR_RAISER_AUTH_URL") or f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/gviz/tq?tqx=out:csv&sheet=%EB%A9%B4%EC%A0%91%EA%B4%80%20%EC%BD%94%EB%93%9C"
 
-def load_auth_data():
-    try:
-        fresh_url = f"{AUTH_URL}&_={int(time.time())}"
-        df = pd.read_csv(fresh_url, dtype=str, keep_default_na=False)
-        df.columns = df.columns.astype(str).str.strip()
-        code_col = next((c for c in df.columns if '코드' in c or '입사일' in c), None)
-        name_col = next((c for c in df.columns if '성명' in c or '이름' in c or '면접관' in c and c != code_col), None)
-        
-        if not code_col or not name_col: return {}
-        codes = df[code_col].str.replace(r'\s+', '', regex=True).str.replace(',', '', regex=False).str.replace(r'\.0*$', '', regex=True)
-        names = df[name_col].str.replace(r'\s+', '', regex=True)
-        
-        valid_dict = {c: n for c, n in zip(codes, names) if c}
-        return valid_dict
-    except Exception as e:
-        return {}
+# 인증 코드 인덱스는 모든 세션이 공유하며, 로그인 화면 rerun마다 시트를 다시 받지 않습니다.
+@st.cache_resource
+def get_auth_store():
+    return AuthStore(AUTH_URL, ttl=300)
+
+# 구간별 소요 시간/재시도/토큰 수는 .cache/metrics.prom에 주기적으로 쓰고,
+# BAR_RAISER_METRICS_PORT를 주면 Prometheus가 긁어갈 수 있는 /metrics 엔드포인트도 엽니다.
+@st.cache_resource
+def start_metrics_export():
+    metrics.start_exporter()
+
+start_metrics_export()
 
 # --- 3. 데이터 초기화 ---
 if "authenticated" not in st.session_state: st.session_state.authenticated = False
@@ -59,7 +67,15 @@ if "user_code" not in st.session_state: st.session_state.user_code = ""
 if "user_nickname" not in st.session_state: st.session_state.user_nickname = ""
 if "user_key" not in st.session_state: st.session_state.user_key = ""
 
+if "session_id" not in st.session_state: st.session_state.session_id = uuid.uuid4().hex
 if "uploader_key" not in st.session_state: st.session_state.uploader_key = 0
+if "upload_errors" not in st.session_state: st.session_state.upload_errors = {}
+if "pending_generation" not in st.session_state: st.session_state.pending_generation = {}
+if "generation_progress" not in st.session_state: st.session_state.generation_progress = {}
+if "spare_questions" not in st.session_state: st.session_state.spare_questions = {}
+if "spare_pending" not in st.session_state: st.session_state.spare_pending = {}
+if "spare_misses" not in st.session_state: st.session_state.spare_misses = {}
+if "input_signature" not in st.session_state: st.session_state.input_signature = None
 
 for key in ["ai_questions", "selected_questions", "view_mode", "temp_setting"]:
     if key not in st.session_state:
@@ -68,28 +84,13 @@ for key in ["ai_questions", "selected_questions", "view_mode", "temp_setting"]:
         elif key == "view_mode": st.session_state[key] = "Standard"
         elif key == "temp_setting": st.session_state[key] = 0.7
 
-BAR_RAISER_CRITERIA = {
-    "Transform": "Enduring Value Creation (시간이 지날수록 더 큰 가치를 만들어내는 솔루션을 구축합니다.)",
-    "Tomorrow": "Forward Thinking (미래를 고려해 확장성과 지속성을 갖춘 솔루션을 구축합니다.)",
-    "Together": "Trust & Growth (서로의 발전을 지원하며 함께 성장합니다.)"
-}
-LEVEL_GUIDELINES = {
-    "IC-L3": "[기본기 확립 실무자] 명확한 지시와 가이드 하에 단기적 업무 수행. 피드백을 성장의 기회로 삼음.",
-    "IC-L4": "[자기완결성 독립 실무자] 외부 변수에 흔들리지 않고 스스로 계획 수립/해결. 협업 요청에 해결 지향적 대응.",
-    "IC-L5": "[핵심 직무 전문가] 복잡/다면적 문제 분석 및 최적 대안 제시. 자신의 전문성으로 팀 성과에 기여 및 후배에게 긍정적 영향.",
-    "IC-L6": "[선도적 전문가] 단일 유닛 성과를 넘어 부서 단위 확장(Scale-up) 시킴. 얽힌 복잡한 과제 리딩 및 이해관계자 설득.",
-    "IC-L7": "[전사 혁신 주도 최고 권위자] 비즈니스 혁신 창출 및 전사적 목표 달성에 기여. C-Level 및 외부 핵심 파트너와 담판.",
-    "M-L5": "[유닛 리더] 단일 기능 유닛 성장 주도. 구성원의 강점과 의견을 존중하고 심리적 안정감 구축.",
-    "M-L6": "[시니어 리더] 독립적 유닛 리딩. 단기 성과뿐만 아니라 구성원 장기 성장 지원. 건강한 갈등을 생산적 논의로 이끎.",
-    "M-L7": "[디렉터] 전사 전략 연계 중장기 로드맵 총괄. 신뢰 기반 권한 위임 및 전사 협력을 통한 시너지 창출."
-}
-
 # --- 4. 로그인(인증) 화면 ---
 if not st.session_state.authenticated:
     st.title("🔒 Bar Raiser Copilot")
     st.info("부여받으신 면접관 코드를 입력해주세요.")
     
-    valid_users = load_auth_data()
+    auth_store = get_auth_store()
+    valid_users = auth_store.get()
     
     col1, col2 = st.columns(2)
     with col1:
@@ -107,12 +108,18 @@ if not st.session_state.authenticated:
     
     st.write("")
     if st.button("인증 및 입장", type="primary"):
+        user_name = auth_store.lookup(clean_code_input)
+        # 시트에 방금 추가된 면접관일 수 있으니, 모르는 코드면 한 번만 강제로 다시 읽어봅니다.
+        if api_key_input and clean_code_input and user_name is None and auth_store.refresh(force=True):
+            user_name = auth_store.lookup(clean_code_input)
+            valid_users = auth_store.get()
+
         if not api_key_input:
             st.error("🚨 개인 API 키를 반드시 입력해주세요!")
-        elif clean_code_input in valid_users:
+        elif user_name is not None:
             st.session_state.authenticated = True
             st.session_state.user_code = clean_code_input
-            st.session_state.user_nickname = valid_users[clean_code_input]
+            st.session_state.user_nickname = user_name
             st.session_state.user_key = api_key_input
             st.rerun()
         elif not valid_users:
@@ -122,180 +129,414 @@ if not st.session_state.authenticated:
     st.stop()
 
 # --- 5. 핵심 기능 함수 ---
-@st.cache_data(ttl=3600)
-def fetch_jd(url):
-    try:
-        res = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-        if res.status_code == 200:
-            soup = BeautifulSoup(res.text, 'html.parser')
-            for s in soup(['script', 'style']): s.decompose()
-            return soup.get_text(separator=' ', strip=True) if len(soup.get_text()) > 50 else None
-    except: return None
-
-def generate_all_questions_at_once(level, resume_file, jd_text, user_api_key, tech_feedback="", portfolio_file=None):
+# JD는 모든 세션이 공유하는 수집기가 백그라운드로 받아오며, 실패도 잠시 기억합니다.
+@st.cache_resource
+def get_jd_fetcher():
+    return JDFetcher(ttl=3600, negative_ttl=60, timeout=10)
+
+# 생성 결과는 세션과 무관하게 디스크에 공유됩니다 (패널 면접에서 같은 후보자를 여러 명이 생성하는 경우).
+@st.cache_resource
+def get_question_cache():
+    return QuestionCache(max_bytes=50 * 1024 * 1024, max_age=7 * 24 * 3600)
+
+# 모든 세션의 생성 요청은 공용 스케줄러를 거칩니다. 같은 API 키로는 동시에 MAX_CALLS_PER_KEY개,
+# 분당 KEY_CALLS_PER_MINUTE번까지만 부르고, 넘치는 요청은 세션별로 돌아가며 순서대로 내보냅니다.
+MAX_CALLS_PER_KEY = 3
+KEY_CALLS_PER_MINUTE = 30
+
+@st.cache_resource
+def get_scheduler():
+    return GenerationScheduler(max_workers=8, max_concurrent_per_key=MAX_CALLS_PER_KEY, calls_per_minute=KEY_CALLS_PER_MINUTE, burst=MAX_CALLS_PER_KEY)
+
+# 세션별 Gemini 컨텍스트 캐시: 지침과 후보자 문서를 한 번 올려 두고 이후 호출(새로고침/다시 뽑기/보충)은 handle로 참조합니다.
+# BAR_RAISER_CONTEXT_CACHE=0이면 끄고 예전처럼 매번 전체를 보냅니다.
+CONTEXT_CACHE_ENABLED = os.environ.get("BAR_RAISER_CONTEXT_CACHE", "1") != "0"
+
+@st.cache_resource
+def get_context_cache():
+    return ContextCache(ttl=1800, refresh_margin=60, negative_ttl=300)
+
+def candidate_context(owner, api_key, resume_file, jd_text, portfolio_file):
+    if not owner or not CONTEXT_CACHE_ENABLED: return None
+    return get_context_cache().handle(owner, context_key(api_key, jd_text, resume_file, portfolio_file), api_key,
+                                      lambda: context_content(jd_text, resume_file, portfolio_file))
+
+# on_item(카테고리, 질문)을 넘기면 스트리밍으로 호출하여, 질문이 완성될 때마다 바로 알려줍니다.
+def generate_all_questions_at_once(level, resume_file, jd_text, user_api_key, tech_feedback="", portfolio_file=None, use_cache=True, on_item=None, context_owner=None):
     final_api_key = user_api_key if user_api_key else st.secrets.get("GEMINI_API_KEY")
     error_dict = {"Transform": [], "Tomorrow": [], "Together": []}
     if not final_api_key: return error_dict
 
-    level_desc = LEVEL_GUIDELINES.get(level, "")
-    feedback_instruction = f" [실무면접 전달사항 반영 필수]: {tech_feedback}." if tech_feedback else ""
-    portfolio_instruction = " 및 제출된 포트폴리오" if portfolio_file else ""
-    
-    # [프롬프트 핵심 수정] 맥락(배경)을 주되 2줄~2.5줄로 길이를 강력하게 통제합니다!
-    prompt = f"""
-    [Role] 당신은 메가존의 최고 수준 'Bar Raiser' 면접관입니다.
-    [Task] 지원자의 이력서와 JD{portfolio_instruction}를 분석하여, 다음 3가지 Core Value를 검증하는 행동 기반 면접 질문을 각각 5개씩 총 15개 생성하세요.
-    
-    [Core Values to Test]
-    1. Transform: {BAR_RAISER_CRITERIA['Transform']}
-    2. Tomorrow: {BAR_RAISER_CRITERIA['Tomorrow']}
-    3. Together: {BAR_RAISER_CRITERIA['Together']}
-
-    [CRITICAL RULES - MUST OBEY]
-    1. (직급/레벨 언급 절대 금지) 질문 내용에 지원자의 지원 레벨({level}), 직급, 연차를 절대 직접적으로 언급하거나 암시하지 마세요. (예: "L5로서~", "리더로서~" 같은 표현 절대 금지) 
-    2. 절대 실무 능력이나 기술적 지식(Hard Skill)을 묻지 마세요.
-    3. (맥락 있는 질문) 갑자기 질문만 던지지 말고, 이력서나 포트폴리오에 적힌 지원자의 특정 경험이나 프로젝트를 먼저 가볍게 언급하며 왜 이 질문을 하는지 자연스러운 배경을 깔아주세요. (예: "이력서를 보니 OOO 프로젝트를 진행하셨던데~")
-    4. (분량 제한) 면접관이 대본으로 자연스럽게 바로 읽을 수 있는 편안한 구어체로 쓰되, 전체 길이는 반드시 **2줄 (최대 2.5줄)**을 넘지 않게 간결함을 유지하세요.
-    5. 겉으로는 티 내지 않되, 내부적으로는 지원자의 요구 역량 수준({level_desc})에 맞는 깊이와 시야를 검증할 수 있는 난이도로 질문을 구성하세요.
-    6. {feedback_instruction}
-    
-    [Output Format] 
-    반드시 아래 JSON 형식으로만 응답하세요.
-    {{
-        "Transform": [ {{"q": "경험을 언급하며 맥락을 부여한 2줄짜리 자연스러운 질문", "i": "명확한 의도 (1줄)"}}, ...5개 ],
-        "Tomorrow": [ {{"q": "경험을 언급하며 맥락을 부여한 2줄짜리 자연스러운 질문", "i": "명확한 의도 (1줄)"}}, ...5개 ],
-        "Together": [ {{"q": "경험을 언급하며 맥락을 부여한 2줄짜리 자연스러운 질문", "i": "명확한 의도 (1줄)"}}, ...5개 ]
-    }}
-    """
-    
     try:
-        parts = [{"text": prompt}]
-        res_bytes = resume_file.getvalue()
-        parts.append({"inline_data": {"mime_type": "application/pdf" if resume_file.name.lower().endswith('pdf') else "image/jpeg", "data": base64.b64encode(res_bytes).decode('utf-8')}})
-        
-        if portfolio_file:
-            port_bytes = portfolio_file.getvalue()
-            parts.append({"inline_data": {"mime_type": "application/pdf" if portfolio_file.name.lower().endswith('pdf') else "image/jpeg", "data": base64.b64encode(port_bytes).decode('utf-8')}})
-            
-        data = {"contents": [{"parts": parts}]}
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={final_api_key}"
-        
-        for attempt in range(3):
-            res = requests.post(url, headers={'Content-Type': 'application/json'}, data=json.dumps(data), timeout=90)
-            if res.status_code == 200:
-                raw = res.json()['candidates'][0]['content']['parts'][0]['text']
-                match = re.search(r'\{.*\}', raw, re.DOTALL)
-                if match: return json.loads(match.group())
-            elif res.status_code == 429:
-                time.sleep(5)
-                continue
-            else: break
+        cache_key = question_cache_key("all", level, resume_file, jd_text, tech_feedback, portfolio_file)
+        if use_cache:
+            cached = get_question_cache().get(cache_key)
+            if is_complete(cached):
+                metrics.count("question_cache_hits_total", kind="all")
+                return cached
+        context = candidate_context(context_owner, final_api_key, resume_file, jd_text, portfolio_file)
+        result = request_all_questions(final_api_key, level, resume_file, jd_text, tech_feedback, portfolio_file, on_item, context)
+        if not result: return error_dict
+        # 복구까지 실패해 모자란 결과를 캐시에 넣으면 같은 후보자는 캐시가 만료될 때까지 계속 모자란 결과를 받습니다.
+        if is_complete(result): get_question_cache().put(cache_key, result)
+        return result
+    except Exception as e:
+        metrics.record_error("generate_all", e)
         return error_dict
-    except: return error_dict
 
-def generate_questions_by_category(category, level, resume_file, jd_text, user_api_key, tech_feedback="", portfolio_file=None, count=5):
+def generate_questions_by_category(category, level, resume_file, jd_text, user_api_key, tech_feedback="", portfolio_file=None, count=5, use_cache=True, on_item=None, avoid=(), context_owner=None):
     final_api_key = user_api_key if user_api_key else st.secrets.get("GEMINI_API_KEY")
     if not final_api_key: return [{"q": "🚨 API 키 오류", "i": "API 키를 확인해주세요."}]
 
-    level_desc = LEVEL_GUIDELINES.get(level, "")
-    value_desc = BAR_RAISER_CRITERIA[category]
-    feedback_instruction = f" [실무면접 전달사항 반영 필수]: {tech_feedback}." if tech_feedback else ""
-    portfolio_instruction = " 및 제출된 포트폴리오" if portfolio_file else ""
-    
-    prompt = f"""
-    [Role] 당신은 메가존의 최고 수준 'Bar Raiser' 면접관입니다.
-    [Value] {category} : {value_desc}
-    [Task] 이력서와 JD{portfolio_instruction} 분석. {count}개 질문 JSON 생성: [{{'q': '질문', 'i': '의도'}}]. 
-    
-    [CRITICAL RULES]
-    1. (직급/레벨 금지) 질문에 레벨({level}), 직급, 연차를 절대 직접 언급하거나 티 내지 마세요.
-    2. (맥락 포함 & 분량 제한) 이력서/포트폴리오의 구체적 경험을 가볍게 언급하여 질문의 배경을 설명하되, 전체 길이는 **2줄(최대 2.5줄)** 이내의 자연스러운 구어체 대본으로 작성하세요.
-    3. Hard Skill 금지. 겉으로 티는 안 나지만 역량 수준({level_desc})에 맞는 난이도의 상황을 물어보세요.
-    4. {feedback_instruction}
-    """
-    
     try:
-        parts = [{"text": prompt}]
-        parts.append({"inline_data": {"mime_type": "application/pdf" if resume_file.name.lower().endswith('pdf') else "image/jpeg", "data": base64.b64encode(resume_file.getvalue()).decode('utf-8')}})
-        if portfolio_file: parts.append({"inline_data": {"mime_type": "application/pdf" if portfolio_file.name.lower().endswith('pdf') else "image/jpeg", "data": base64.b64encode(portfolio_file.getvalue()).decode('utf-8')}})
-        data = {"contents": [{"parts": parts}]}
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={final_api_key}"
-        
-        for attempt in range(3):
-            res = requests.post(url, headers={'Content-Type': 'application/json'}, data=json.dumps(data), timeout=60)
-            if res.status_code == 200:
-                raw = res.json()['candidates'][0]['content']['parts'][0]['text']
-                match = re.search(r'\[\s*\{.*\}\s*\]', raw, re.DOTALL)
-                if match: return json.loads(match.group())
-            elif res.status_code == 429:
-                time.sleep(4)
-                continue
-            else: return [{"q": "🚨 오류 발생", "i": "다시 시도해주세요."}]
-        return [{"q": "🚨 과부하", "i": "다시 시도해주세요."}]
-    except: return [{"q": "🚨 오류", "i": "파일을 확인해주세요."}]
+        cache_key = question_cache_key(f"{category}:{count}", level, resume_file, jd_text, tech_feedback, portfolio_file)
+        if use_cache:
+            cached = get_question_cache().get(cache_key)
+            if cached and len(cached) == count:
+                metrics.count("question_cache_hits_total", kind="category")
+                return cached
+        context = candidate_context(context_owner, final_api_key, resume_file, jd_text, portfolio_file)
+        result = request_category_questions(final_api_key, category, level, resume_file, jd_text, tech_feedback, portfolio_file, count, on_item, avoid, context)
+        if not result: return [{"q": "🚨 오류 발생", "i": "다시 시도해주세요."}]
+        # 기존 질문을 피해서 뽑은 결과(예비/교체 질문)는 이 입력의 대표 결과가 아니므로 캐시에 넣지 않습니다.
+        # 개수가 모자란 결과도 마찬가지로 넣지 않습니다.
+        if not avoid and len(result) == count: get_question_cache().put(cache_key, result)
+        return result
+    except CircuitOpenError as e: return [{"q": "🚨 과부하", "i": f"{e.retry_in:.0f}초 후 다시 시도해주세요."}]
+    except GeminiError as e:
+        if e.status in (0, 429): return [{"q": "🚨 과부하", "i": "다시 시도해주세요."}]
+        return [{"q": "🚨 오류 발생", "i": "다시 시도해주세요."}]
+    except Exception as e:
+        metrics.record_error("generate_category", e)
+        return [{"q": "🚨 오류", "i": "파일을 확인해주세요."}]
+
+# 같은 API 키와 같은 입력으로 동시에 누른 요청은 세션이 달라도 한 번만 호출하고 결과를 나눠 받습니다 (single-flight).
+# 패널 면접관이 각자 키로 생성하면 호출은 따로 하지만, 먼저 끝난 결과는 질문 캐시로 나눠 씁니다.
+def submit_generation(category, level, resume_file, jd_text, tech_feedback="", portfolio_file=None, count=5, use_cache=True, on_item=None, avoid=(), background=False):
+    """category가 None이면 세 역량을 한 번에 생성합니다. avoid에 준 질문과는 겹치지 않게 뽑습니다.
+    background면 이 키가 한가할 때만 호출합니다 (예비 질문용). 이 세션 전용 Future를 돌려줍니다."""
+    api_key, owner = st.session_state.user_key, st.session_state.session_id
+    if category is None:
+        fn = partial(generate_all_questions_at_once, context_owner=owner)
+        kind, args = "all", (level, resume_file, jd_text, api_key, tech_feedback, portfolio_file, use_cache)
+    else:
+        fn = partial(generate_questions_by_category, avoid=tuple(avoid), context_owner=owner)
+        kind, args = f"{category}:{count}", (category, level, resume_file, jd_text, api_key, tech_feedback, portfolio_file, count, use_cache)
+    flight_key = content_key(question_cache_key(kind, level, resume_file, jd_text, tech_feedback, portfolio_file), "cache" if use_cache else "fresh", *avoid)
+    return get_scheduler().submit(flight_key, api_key, owner, fn, *args, on_item=on_item, background=background)
+
+def generation_status_text(fut, label):
+    state, ahead = get_scheduler().status(fut)
+    if state == 'queued': return f"🕒 {label} 대기 중... (앞에 {ahead}건, API 키 호출 한도 때문에 순서대로 처리합니다)"
+    return f"⏳ {label} 중..."
+
+def wait_for_generation(fut, label):
+    """스피너 대신 대기열 순번/진행 상태를 보여주면서 결과를 기다립니다."""
+    box = st.empty()
+    while not fut.done():
+        box.info(generation_status_text(fut, label))
+        time.sleep(0.2)
+    box.empty()
+    return fut.result()
+
+# --- 다시 뽑기용 예비 질문 ---
+# 역량별 첫 생성이 끝나면 예비 질문을 백그라운드로 미리 받아 두고, '다시 뽑기'는 여기서 바로 꺼내 씁니다.
+# 화면에 나온 질문과 노트에 담은 질문은 받을 때와 꺼낼 때 모두 걸러내고, SPARE_MIN개 아래로 줄면 다시 채웁니다.
+# 예비 요청은 스케줄러의 background 요청이라 같은 API 키의 실제 생성 요청을 늦추지 않습니다.
+# 예비 질문이 바닥났을 때만 예전처럼 그 자리에서 생성을 기다립니다.
+SPARE_TARGET = 5
+SPARE_MIN = 3
+SPARE_MAX_MISSES = 2  # 연속으로 새 질문을 못 받으면 입력이 바뀔 때까지 더 요청하지 않습니다.
+
+def normalize_question(text):
+    return " ".join(str(text).split())
+
+def shown_questions():
+    ss = st.session_state
+    shown = {normalize_question(q.get("q", "")) for qs in ss.ai_questions.values() for q in qs}
+    return shown | {normalize_question(q.get("q", "")) for q in ss.selected_questions}
+
+def is_error_card(q):
+    return not q.get("q") or str(q["q"]).startswith("🚨")
+
+def clear_spares():
+    for fut in st.session_state.spare_pending.values(): fut.cancel()
+    st.session_state.spare_questions = {}
+    st.session_state.spare_pending = {}
+    st.session_state.spare_misses = {}
+
+def collect_spares():
+    ss = st.session_state
+    shown = shown_questions()
+    for cat, fut in list(ss.spare_pending.items()):
+        if not fut.done(): continue
+        ss.spare_pending.pop(cat)
+        try:
+            new = fut.result()
+        except Exception as e:
+            metrics.record_error("spare_refill", e)
+            new = []
+        pool = ss.spare_questions.setdefault(cat, [])
+        seen = shown | {normalize_question(q["q"]) for q in pool}
+        added = 0
+        for q in new or []:
+            key = normalize_question(q.get("q", ""))
+            if is_error_card(q) or key in seen: continue
+            pool.append(q)
+            seen.add(key)
+            added += 1
+        ss.spare_misses[cat] = 0 if added else ss.spare_misses.get(cat, 0) + 1
+
+def track_inputs(inp):
+    """후보자나 조건이 바뀌면 이전 입력으로 받아 둔 예비 질문과 컨텍스트 캐시를 버립니다."""
+    # JD는 본문이 아니라 URL로 봅니다. 본문 수집이 끝나는 순간 입력이 바뀐 것으로 보지 않기 위함입니다.
+    sig = (inp.level, st.session_state.get("input_jd_url", "").strip(), inp.feedback, inp.resume.file_id, inp.portfolio.file_id if inp.portfolio else None) if inp.resume and inp.jd else None
+    if sig != st.session_state.input_signature:
+        clear_spares()
+        get_context_cache().release(st.session_state.session_id)
+        st.session_state.input_signature = sig
+
+def refill_spares(inp):
+    """끝난 예비 요청을 모으고, 모자란 역량은 새로 요청만 해 둡니다. 기다리지 않습니다."""
+    ss = st.session_state
+    collect_spares()
+    if ss.input_signature is None or ss.pending_generation: return
+    shown = shown_questions()
+    for cat in CATEGORIES:
+        qs = ss.ai_questions.get(cat, [])
+        if not qs or any(is_error_card(q) for q in qs): continue
+        pool = ss.spare_questions.get(cat, [])
+        if cat in ss.spare_pending or len(pool) >= SPARE_MIN or ss.spare_misses.get(cat, 0) >= SPARE_MAX_MISSES: continue
+        avoid = sorted(shown | {normalize_question(q["q"]) for q in pool})
+        ss.spare_pending[cat] = submit_generation(cat, inp.level, inp.resume, inp.jd, inp.feedback, inp.portfolio, SPARE_TARGET, use_cache=False, avoid=avoid, background=True)
+
+def take_spares(cat, n):
+    """예비 질문을 최대 n개 꺼냅니다. 그사이 화면/노트에 같은 질문이 생겼으면 버립니다."""
+    shown = shown_questions()
+    pool = st.session_state.spare_questions.get(cat, [])
+    taken = []
+    while pool and len(taken) < n:
+        q = pool.pop(0)
+        if normalize_question(q["q"]) not in shown: taken.append(q)
+    return taken
+
+def replace_questions(cat, indices, inp, label):
+    """indices 자리의 질문을 예비 질문으로 바꾸고, 모자란 만큼만 바로 생성해서 채웁니다. None이면 전체를 바꿉니다.
+    이력서나 JD가 없어서(업로더에서 지웠거나 미리 생성한 결과를 불러온 경우) 다시 뽑을 수 없으면 안내만 하고 False를 돌려줍니다."""
+    if inp.resume is None or not inp.jd:
+        st.warning("질문을 다시 뽑으려면 사이드바에 이력서와 JD 링크를 입력해주세요.")
+        return False
+    n = 5 if indices is None else len(indices)
+    collect_spares()
+    new_qs = take_spares(cat, n)
+    metrics.count("spare_pool_total", result="hit" if len(new_qs) == n else "miss")
+    if len(new_qs) < n:
+        fut = submit_generation(cat, inp.level, inp.resume, inp.jd, inp.feedback, inp.portfolio, n - len(new_qs), use_cache=False,
+                                avoid=sorted(shown_questions() | {normalize_question(q["q"]) for q in new_qs}))
+        new_qs += wait_for_generation(fut, label)
+    if indices is None:
+        st.session_state.ai_questions[cat] = new_qs
+        indices = range(max(5, len(new_qs)))
+    else:
+        for new_q, target_idx in zip(new_qs, indices): st.session_state.ai_questions[cat][target_idx] = new_q
+    for idx in indices:
+        if f"chk_{cat}_{idx}" in st.session_state: st.session_state[f"chk_{cat}_{idx}"] = False
+    # 꺼낸 만큼 백그라운드에서 다시 채웁니다.
+    refill_spares(inp)
+    return True
+
+# 업로드 크기 상한(MB). 원본을 inline으로 보내야 하는 큰 스캔본은 어차피 Gemini 요청 한도(20MB)를 넘습니다.
+# 실제로 메모리에 들어오기 전에 막는 것은 .streamlit/config.toml의 server.maxUploadSize이므로 두 값을 같게 맞춰 두세요.
+# 여기서는 그 설정 없이 띄웠을 때(Streamlit 기본 200MB)를 위해 한 번 더 확인하고, 넘는 파일은 업로드 저장소에서 바로 지웁니다.
+MAX_UPLOAD_MB = float(os.environ.get("BAR_RAISER_MAX_UPLOAD_MB", "20"))
+
+def within_upload_limit(f):
+    return f if f is not None and f.size <= MAX_UPLOAD_MB * 1024 * 1024 else None
+
+def remove_upload(f):
+    """업로드 저장소에서 파일을 지웁니다. 업로더 key만 바꾸면 원본이 세션이 끝날 때까지 메모리에 남기 때문입니다.
+    remove_file은 UploadedFileManager 인터페이스가 아니라 기본 메모리 구현에만 있으므로, 없으면 세션 종료 때 정리에 맡깁니다."""
+    ctx = get_script_run_ctx()
+    remove_file = getattr(ctx.uploaded_file_mgr, "remove_file", None) if ctx else None
+    if remove_file: remove_file(ctx.session_id, f.file_id)
+
+def check_upload_size(key):
+    """업로더 on_change. 상한을 넘는 파일은 처리하지 않고 바로 지우며, 업로더를 비우거나 다른 파일을 올릴 때까지 안내합니다.
+    이력서가 생기거나 빠지면 질문 영역의 새로고침 버튼 활성 여부도 바뀌므로 전체를 다시 그립니다."""
+    request_full_rerun()
+    f = st.session_state.get(key)
+    if f is not None and within_upload_limit(f) is None:
+        remove_upload(f)
+        st.session_state.upload_errors[key] = f"🚨 {f.name} ({format_size(f.size)}) 파일이 너무 큽니다. {MAX_UPLOAD_MB:.0f}MB 이하로 올려주세요."
+    else:
+        st.session_state.upload_errors.pop(key, None)
+
+def release_uploads():
+    """이 세션이 올린 이력서/포트폴리오를 업로드 저장소와 문서 캐시에서 지웁니다."""
+    for key in (f"uploader_{st.session_state.uploader_key}", f"port_uploader_{st.session_state.uploader_key}"):
+        f = st.session_state.get(key)
+        if f is None: continue
+        # 상한을 넘어 처리하지 않은 파일은 문서 캐시에 없으므로 해시하지 않습니다.
+        if within_upload_limit(f): discard_document(upload_digest(f))
+        remove_upload(f)
+    st.session_state.upload_errors = {}
 
 def reset_all_inputs():
+    for fut in st.session_state.pending_generation.values(): fut.cancel()
+    clear_spares()
+    get_context_cache().release(st.session_state.session_id)
+    release_uploads()
+    st.session_state.pending_generation = {}
+    st.session_state.generation_progress = {}
     st.session_state.ai_questions = {"Transform": [], "Tomorrow": [], "Together": []}
     st.session_state.selected_questions = []
     if "input_candidate" in st.session_state: st.session_state.input_candidate = ""
     if "input_jd_url" in st.session_state: st.session_state.input_jd_url = ""
     if "input_feedback" in st.session_state: st.session_state.input_feedback = ""
     if "input_agree" in st.session_state: st.session_state.input_agree = False
+    if "input_fresh" in st.session_state: st.session_state.input_fresh = False
     if "input_level" in st.session_state: st.session_state.input_level = list(LEVEL_GUIDELINES.keys())[0]
     st.session_state.uploader_key += 1
 
+# 로그아웃하면 이 세션이 올린 파일(업로더 포함)과 그 문서/컨텍스트 캐시만 비웁니다.
+# 질문과 면접관 노트는 예전처럼 그대로 두며, 다시 로그인하면 이어서 볼 수 있습니다 (지우려면 '초기화').
+def logout():
+    clear_spares()
+    get_context_cache().release(st.session_state.session_id)
+    release_uploads()
+    st.session_state.uploader_key += 1
+    st.session_state.authenticated = False
+
+# batch.py로 미리 만든 결과 한 줄을 생성 호출 없이 바로 화면에 채웁니다.
+# 이전 후보자의 이력서/포트폴리오가 남아 있으면 다시 뽑기/새로고침/예비 질문이 불러온 JD와 섞여 만들어지므로, 초기화처럼 업로드를 비웁니다.
+def load_batch_record(record):
+    for fut in st.session_state.pending_generation.values(): fut.cancel()
+    clear_spares()
+    get_context_cache().release(st.session_state.session_id)
+    release_uploads()
+    st.session_state.uploader_key += 1
+    st.session_state.pending_generation = {}
+    st.session_state.generation_progress = {}
+    st.session_state.ai_questions = {cat: record["questions"].get(cat, []) for cat in CATEGORIES}
+    for key in [k for k in st.session_state if k.startswith("chk_")]: st.session_state[key] = False
+    st.session_state.input_candidate = record.get("candidate", "")
+    if record.get("level") in LEVEL_GUIDELINES: st.session_state.input_level = record["level"]
+    st.session_state.input_jd_url = record.get("jd_url", "")
+    st.session_state.input_feedback = record.get("feedback", "")
+
 # --- 6. 사이드바 구성 ---
-with st.sidebar:
+# 사이드바/질문 리스트/노트는 각각 fragment라서 자기 영역의 위젯을 건드리면 그 영역만 다시 그립니다.
+# 그래서 메인 화면은 사이드바 함수의 지역 변수 대신 session_state에 저장된 입력값을 읽습니다.
+def current_inputs():
+    ss = st.session_state
+    jd_url = ss.get("input_jd_url", "").strip()
+    jd_text = (get_jd_fetcher().peek(jd_url)[1] or jd_url) if jd_url else None
+    return SimpleNamespace(
+        candidate=ss.get("input_candidate", ""),
+        level=ss.get("input_level", list(LEVEL_GUIDELINES.keys())[0]),
+        jd=jd_text,
+        resume=within_upload_limit(ss.get(f"uploader_{ss.uploader_key}")),
+        portfolio=within_upload_limit(ss.get(f"port_uploader_{ss.uploader_key}")),
+        feedback=ss.get("input_feedback", ""),
+    )
+
+# 후보자 이름/레벨은 노트의 .txt 머리말과 파일 이름에도 쓰이므로, 바뀌면 사이드바만이 아니라 전체를 다시 그립니다.
+# 콜백 안의 st.rerun()은 무시되므로 표시만 해 두고, 이어서 도는 사이드바 fragment 맨 앞에서 전체 rerun을 합니다.
+def request_full_rerun():
+    st.session_state.full_rerun = True
+
+@st.fragment
+def render_sidebar():
+    if st.session_state.pop("full_rerun", False): st.rerun()
     st.title("✈️ Copilot Menu")
     st.success(f"👤 접속 완료: **{st.session_state.user_nickname}** 님")
     
     st.markdown('<div class="security-alert">🚨 <b>보안 주의사항</b><br>민감 정보는 마스킹 후 업로드하세요.</div>', unsafe_allow_html=True)
     
-    candidate_name = st.text_input("👤 후보자 이름", placeholder="이름 입력", key="input_candidate")
-    selected_level = st.selectbox("1. 레벨 선택", list(LEVEL_GUIDELINES.keys()), key="input_level")
+    st.text_input("👤 후보자 이름", placeholder="이름 입력", key="input_candidate", on_change=request_full_rerun)
+    selected_level = st.selectbox("1. 레벨 선택", list(LEVEL_GUIDELINES.keys()), key="input_level", on_change=request_full_rerun)
     
     st.subheader("2. JD (채용공고)")
     url_in = st.text_input("JD URL", placeholder="채용공고 링크를 붙여넣으세요.", label_visibility="collapsed", key="input_jd_url")
-    jd_final = fetch_jd(url_in.strip()) if url_in else None
-    if url_in and not jd_final: jd_final = url_in.strip()
+    jd_url = url_in.strip()
+    jd_final = None
+    if jd_url:
+        jd_status, jd_final = get_jd_fetcher().peek(jd_url)
+        if jd_status == 'loading' and not jd_final: st.caption("⏳ 채용공고를 불러오는 중입니다...")
+        elif jd_status == 'error':
+            st.caption("⚠️ 채용공고 본문을 가져오지 못해 링크만 전달합니다.")
+            jd_final = jd_url
 
+    resume_key, port_key = f"uploader_{st.session_state.uploader_key}", f"port_uploader_{st.session_state.uploader_key}"
     st.subheader("3. 이력서 업로드 (필수)")
-    resume_file = st.file_uploader("이력서 파일 선택", type=["pdf", "png", "jpg", "jpeg"], label_visibility="collapsed", key=f"uploader_{st.session_state.uploader_key}")
+    resume_file = st.file_uploader("이력서 파일 선택", type=["pdf", "png", "jpg", "jpeg"], label_visibility="collapsed", key=resume_key, on_change=check_upload_size, args=(resume_key,))
+    if resume_key in st.session_state.upload_errors: st.error(st.session_state.upload_errors[resume_key])
     
     st.subheader("3-1. 포트폴리오 업로드 (선택)")
-    portfolio_file = st.file_uploader("포트폴리오 파일 선택", type=["pdf", "png", "jpg", "jpeg"], label_visibility="collapsed", key=f"port_uploader_{st.session_state.uploader_key}")
+    portfolio_file = st.file_uploader("포트폴리오 파일 선택", type=["pdf", "png", "jpg", "jpeg"], label_visibility="collapsed", key=port_key, on_change=check_upload_size, args=(port_key,))
+    if port_key in st.session_state.upload_errors: st.error(st.session_state.upload_errors[port_key])
+    resume_file, portfolio_file = within_upload_limit(resume_file), within_upload_limit(portfolio_file)
+    
+    if resume_file:
+        # 텍스트 추출 결과는 파일 해시별로 캐시되므로, 여기서 미리 만들어 두면 생성 호출 때는 바로 재사용됩니다.
+        upload_docs = prepare_uploads(resume_file, portfolio_file)
+        before, after = sum(d.inline_bytes for d in upload_docs), sum(d.sent_bytes for d in upload_docs)
+        modes = " / ".join("텍스트" if d.mode == "text" else "원본" for d in upload_docs)
+        st.caption(f"📉 전송 크기: {format_size(before)} → {format_size(after)} ({modes})")
     
     st.subheader("4. 이전 면접(실무) 전달사항 (선택)")
     tech_feedback = st.text_area("확인 요망 사항", placeholder="예: 협업 시 갈등을 어떻게 해결했는지 더 깊게 검증해 주세요.", height=80, label_visibility="collapsed", key="input_feedback")
 
     st.divider()
     agree = st.checkbox("✅ 민감 정보 없음을 확인했습니다.", key="input_agree")
+    fresh = st.checkbox("🆕 이전 생성 결과 무시하고 새로 생성", key="input_fresh", help="같은 후보자/조건으로 이미 생성된 질문이 있으면 기본적으로 즉시 재사용합니다.")
+    gen_mode = st.radio("생성 방식", ["⚡ 역량별 동시 생성", "📦 한 번에 생성"], key="input_gen_mode", horizontal=True, help="역량별 동시 생성은 먼저 끝난 역량부터 바로 보여주고, 실패한 역량만 다시 뽑을 수 있습니다.")
+    streaming = st.checkbox("📡 완성된 질문부터 바로 보기 (스트리밍)", value=True, key="input_streaming")
     
     if st.button("질문 생성 시작 🚀", type="primary", use_container_width=True, disabled=not agree):
+        # 아직 받는 중이면 여기서만 기다리고, 끝내 못 받으면 예전처럼 링크 자체를 JD로 넘깁니다.
+        if jd_url and not jd_final: jd_final = get_jd_fetcher().result(jd_url) or jd_url
         if resume_file and jd_final:
-            with st.spinner("⚡ 전체 문항을 한 번에 생성 중입니다. (약 10~15초 소요)"):
-                result_json = generate_all_questions_at_once(
-                    selected_level, resume_file, jd_final, st.session_state.user_key, tech_feedback, portfolio_file
-                )
-                if result_json and any(result_json.values()):
-                    for cat in ["Transform", "Tomorrow", "Together"]:
-                        if cat in result_json: st.session_state.ai_questions[cat] = result_json[cat]
-                else:
-                    st.error("🚨 구글 서버 접속 지연. 다시 시도해주세요.")
+            track_inputs(current_inputs())
+            # 생성은 백그라운드에서 돌리고, 결과(스트리밍이면 질문 하나하나)는 메인 화면에서 도착하는 순서대로 채웁니다.
+            progress = {cat: [] for cat in CATEGORIES}
+            on_item = (lambda cat, item: progress[cat].append(item) if cat in progress else None) if streaming else None
+            if gen_mode.startswith("⚡"):
+                pending = {
+                    cat: submit_generation(cat, selected_level, resume_file, jd_final, tech_feedback, portfolio_file, 5, not fresh, on_item)
+                    for cat in CATEGORIES
+                }
+            else:
+                fut = submit_generation(None, selected_level, resume_file, jd_final, tech_feedback, portfolio_file, use_cache=not fresh, on_item=on_item)
+                pending = {cat: fut for cat in CATEGORIES}
+            st.session_state.pending_generation = pending
+            st.session_state.generation_progress = progress
+            st.session_state.ai_questions = {cat: [] for cat in CATEGORIES}
             st.rerun()
         else:
             st.error("이력서와 JD 링크를 모두 입력해주세요.")
 
+    with st.expander("📂 미리 생성한 질문 불러오기"):
+        batch_file = st.file_uploader("일괄 생성 결과 (.jsonl)", type=["jsonl"], key="batch_results")
+        records = [r for r in read_results(batch_file.getvalue().decode("utf-8").splitlines()).values() if r.get("status") == "ok"] if batch_file else []
+        if records:
+            choice = st.selectbox("후보자", range(len(records)), format_func=lambda i: f"{records[i]['candidate'] or '이름 미상'} ({records[i]['level']})", key="batch_choice")
+            if st.button("📥 불러오기", use_container_width=True, on_click=load_batch_record, args=(records[choice],)): st.rerun()
+            st.caption("불러온 뒤 질문을 다시 뽑으려면 이력서를 업로드해주세요.")
+        elif batch_file:
+            st.caption("불러올 수 있는 생성 결과가 없습니다.")
+
     st.divider()
     
-    st.button("🗑️ 초기화", use_container_width=True, on_click=reset_all_inputs)
+    if st.button("🗑️ 초기화", use_container_width=True, on_click=reset_all_inputs): st.rerun()
 
     st.markdown('<div class="logout-btn">', unsafe_allow_html=True)
-    if st.button("🚪 로그아웃", help="인증 화면으로 돌아갑니다"):
-        st.session_state.authenticated = False
-        st.rerun()
+    if st.button("🚪 로그아웃", help="인증 화면으로 돌아갑니다", on_click=logout): st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
 
+with st.sidebar:
+    render_sidebar()
+
 # --- 7. 메인 화면 ---
 st.title("✈️ Bar Raiser Copilot")
 c1, c2, c3 = st.columns(3)
@@ -304,57 +545,100 @@ if c2.button("⬅️ 기본 보기 (반반)", use_container_width=True): st.sess
 if c3.button("↔️ 면접관 노트만 보기", use_container_width=True): st.session_state.view_mode = "NoteWide"; st.rerun()
 st.divider()
 
+def question_card_html(i, q):
+    return f"""
+            <div class="q-card">
+                <div class="q-text">Q{i+1}. {q.get('q', '')}</div>
+                <div class="i-text">🎯 <b>의도:</b> {q.get('i', '')}</div>
+            </div>
+            """
+
+def render_category(cat):
+    inp = current_inputs()
+    desc = BAR_RAISER_CRITERIA[cat].split('(')[0].strip()
+    # 미리 생성한 결과를 불러왔거나 이력서를 지웠으면 다시 뽑을 재료가 없으므로 버튼을 막아 둡니다.
+    no_inputs = inp.resume is None or not inp.jd
+    refresh_help = "사이드바에 이력서와 JD 링크를 입력하면 다시 뽑을 수 있습니다." if no_inputs else None
+    with st.expander(f"📌 {cat} ({desc})", expanded=False):
+        
+        b1, b2 = st.columns(2)
+        with b1:
+            if st.button("🔄 전체 새로고침", key=f"ref_all_{cat}", use_container_width=True, disabled=no_inputs, help=refresh_help):
+                if replace_questions(cat, None, inp, "새로 뽑기"): st.rerun(scope="fragment")
+        with b2:
+            if st.button("♻️ 선택한 질문만 다시 뽑기", key=f"ref_sel_{cat}", use_container_width=True, disabled=no_inputs, help=refresh_help):
+                sel_indices = [idx for idx in range(len(st.session_state.ai_questions[cat])) if st.session_state.get(f"chk_{cat}_{idx}")]
+                if sel_indices:
+                    if replace_questions(cat, sel_indices, inp, "선택된 질문 교체"): st.rerun(scope="fragment")
+                else:
+                    st.warning("다시 뽑을 질문을 먼저 체크해주세요!")
+        
+        st.write("") 
+        
+        for i, q in enumerate(st.session_state.ai_questions.get(cat, [])):
+            q_v = q.get('q', '')
+            st.markdown(question_card_html(i, q), unsafe_allow_html=True)
+            
+            ca, cb = st.columns([0.7, 0.3])
+            with ca:
+                st.checkbox("이 질문 다시 뽑기", key=f"chk_{cat}_{i}")
+            with cb:
+                if st.button("➕ 노트에 담기", key=f"add_{cat}_{i}", use_container_width=True):
+                    if q_v and q_v not in [sq['q'] for sq in st.session_state.selected_questions]:
+                        st.session_state.selected_questions.append({"q": q_v, "cat": cat, "memo": ""})
+                        # 노트는 별도 fragment라서 전체를 한 번 다시 그려야 보입니다. 토스트는 다음 실행에서 띄웁니다.
+                        st.session_state.note_added_toast = True
+                        st.rerun()
+
+def render_pending_category(cat, items, fut):
+    desc = BAR_RAISER_CRITERIA[cat].split('(')[0].strip()
+    status = generation_status_text(fut, f"{cat} ({desc}) 질문 생성")
+    st.info(f"{status} ({len(items)}개 도착)" if items else status)
+    for i, q in enumerate(items):
+        st.markdown(question_card_html(i, q), unsafe_allow_html=True)
+
+def collect_finished_generation():
+    pending = st.session_state.pending_generation
+    for cat, fut in list(pending.items()):
+        if not fut.done(): continue
+        try:
+            result = fut.result()
+        except Exception as e:
+            metrics.record_error("generation_future", e)
+            result = None
+        if isinstance(result, dict): result = result.get(cat)
+        # 한 역량이 실패해도 나머지는 그대로 두고, 그 역량만 다시 뽑을 수 있게 오류 카드를 남깁니다.
+        st.session_state.ai_questions[cat] = result if result else [{"q": "🚨 오류 발생", "i": "이 역량만 '전체 새로고침'으로 다시 시도해주세요."}]
+        pending.pop(cat)
+    if not pending: st.session_state.generation_progress = {}
+
+# 생성 중에는 이 fragment만 주기적으로 다시 돌면서, 끝난 역량과 스트리밍으로 도착한 질문을 채웁니다.
+@metrics.timed("render_questions")
 def render_questions():
     st.subheader("🎯 제안 질문 리스트")
-    if not any(st.session_state.ai_questions.values()):
+    pending = st.session_state.pending_generation
+    was_pending = bool(pending)
+    collect_finished_generation()
+    inp = current_inputs()
+    track_inputs(inp)
+    refill_spares(inp)
+    if not pending and not any(st.session_state.ai_questions.values()):
         st.info("👈 사이드바 정보를 채운 후 버튼을 눌러주세요.")
         return
-    for cat in ["Transform", "Tomorrow", "Together"]:
-        desc = BAR_RAISER_CRITERIA[cat].split('(')[0].strip()
-        with st.expander(f"📌 {cat} ({desc})", expanded=False):
-            
-            b1, b2 = st.columns(2)
-            with b1:
-                if st.button("🔄 전체 새로고침", key=f"ref_all_{cat}", use_container_width=True):
-                    with st.spinner("새로 뽑는 중..."):
-                        st.session_state.ai_questions[cat] = generate_questions_by_category(cat, selected_level, resume_file, jd_final, st.session_state.user_key, tech_feedback, portfolio_file, 5)
-                        for idx in range(5):
-                            if f"chk_{cat}_{idx}" in st.session_state: st.session_state[f"chk_{cat}_{idx}"] = False
-                    st.rerun()
-            with b2:
-                if st.button("♻️ 선택한 질문만 다시 뽑기", key=f"ref_sel_{cat}", use_container_width=True):
-                    sel_indices = [idx for idx in range(len(st.session_state.ai_questions[cat])) if st.session_state.get(f"chk_{cat}_{idx}")]
-                    if sel_indices:
-                        with st.spinner("선택된 질문 교체 중..."):
-                            new_qs = generate_questions_by_category(cat, selected_level, resume_file, jd_final, st.session_state.user_key, tech_feedback, portfolio_file, len(sel_indices))
-                            for new_q, target_idx in zip(new_qs, sel_indices):
-                                st.session_state.ai_questions[cat][target_idx] = new_q
-                                st.session_state[f"chk_{cat}_{target_idx}"] = False
-                        st.rerun()
-                    else:
-                        st.warning("다시 뽑을 질문을 먼저 체크해주세요!")
-            
-            st.write("") 
-            
-            for i, q in enumerate(st.session_state.ai_questions.get(cat, [])):
-                q_v, i_v = q.get('q', ''), q.get('i', '')
-                st.markdown(f"""
-                <div class="q-card">
-                    <div class="q-text">Q{i+1}. {q_v}</div>
-                    <div class="i-text">🎯 <b>의도:</b> {i_v}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                ca, cb = st.columns([0.7, 0.3])
-                with ca:
-                    st.checkbox("이 질문 다시 뽑기", key=f"chk_{cat}_{i}")
-                with cb:
-                    if st.button("➕ 노트에 담기", key=f"add_{cat}_{i}", use_container_width=True):
-                        if q_v and q_v not in [sq['q'] for sq in st.session_state.selected_questions]:
-                            st.session_state.selected_questions.append({"q": q_v, "cat": cat, "memo": ""})
-                            st.toast("✅ 면접관 노트에 추가되었습니다!")
+    progress = st.session_state.generation_progress
+    if pending:
+        running, waiting = get_scheduler().queue_depth(st.session_state.user_key)
+        st.caption(f"📶 이 API 키로 진행 중인 요청: 실행 {running}건 · 대기 {waiting}건 (다른 면접관 요청 포함)")
+    for cat in CATEGORIES:
+        if cat in pending: render_pending_category(cat, list(progress.get(cat, [])), pending[cat])
+        else: render_category(cat)
+    # 모두 끝났으면 전체를 한 번 다시 그려 주기적 실행을 멈춥니다.
+    if was_pending and not pending: st.rerun()
 
+@st.fragment
+@metrics.timed("render_notes")
 def render_notes():
+    inp = current_inputs()
     st.subheader("📝 면접관 노트")
     if st.button("➕ 직접 입력 (새 질문)", use_container_width=True): 
         st.session_state.selected_questions.append({"q": "", "cat": "Custom", "memo": ""})
@@ -367,13 +651,13 @@ def render_notes():
         st.session_state.selected_questions[idx]['memo'] = st.text_area("메모/답변", value=item.get('memo',''), placeholder="지원자 답변 및 평가 메모...", height=200, key=f"am_{idx}", label_visibility="collapsed")
         
         if st.button("🗑️ 삭제", key=f"del_{idx}"): 
-            st.session_state.selected_questions.pop(idx); st.rerun()
+            st.session_state.selected_questions.pop(idx); st.rerun(scope="fragment")
         st.markdown("---")
 
     if st.session_state.selected_questions:
         txt_content = f"=========================================\n"
-        txt_content += f" 👤 면접 후보자 : {candidate_name if candidate_name else '이름 미상'}\n"
-        txt_content += f" 📊 지원 레벨 : {selected_level}\n"
+        txt_content += f" 👤 면접 후보자 : {inp.candidate if inp.candidate else '이름 미상'}\n"
+        txt_content += f" 📊 지원 레벨 : {inp.level}\n"
         txt_content += f"=========================================\n\n"
         
         for idx, s in enumerate(st.session_state.selected_questions):
@@ -386,17 +670,21 @@ def render_notes():
             txt_content += f"A (답변 및 메모) :\n{cur_a}\n"
             txt_content += f"=========================================\n\n"
             
-        st.download_button("💾 결과 텍스트로 저장하기 (.txt)", txt_content, f"면접기록_{candidate_name}.txt", type="primary", use_container_width=True)
+        st.download_button("💾 결과 텍스트로 저장하기 (.txt)", txt_content, f"면접기록_{inp.candidate}.txt", type="primary", use_container_width=True)
+
+if st.session_state.pop("note_added_toast", False): st.toast("✅ 면접관 노트에 추가되었습니다!")
+
+questions_fragment = st.fragment(render_questions, run_every=0.5 if st.session_state.pending_generation else None)
 
 if st.session_state.view_mode == "QuestionWide": 
     _, col_center, _ = st.columns([1, 3, 1])
     with col_center:
-        render_questions()
+        questions_fragment()
 elif st.session_state.view_mode == "NoteWide": 
     _, col_center, _ = st.columns([1, 3, 1])
     with col_center:
         render_notes()
 else:
     cl, cr = st.columns([1.1, 1])
-    with cl: render_questions()
+    with cl: questions_fragment()
     with cr: render_notes()
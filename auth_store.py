@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+
+import metrics
+
+# --- 면접관 인증 코드 저장소 (모든 세션 공용) ---
+# 시트 CSV를 매 rerun마다 받지 않고, 메모리 인덱스(code -> name)를 TTL 동안 재사용합니다.
+# TTL이 지나면 기존 인덱스를 그대로 돌려주면서 백그라운드에서 갱신합니다 (stale-while-revalidate).
+# 시트에 접근할 수 없을 때는 마지막으로 성공한 스냅샷 파일을 사용합니다.
+
+CACHE_ROOT = os.environ.get("BAR_RAISER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+DEFAULT_SNAPSHOT_PATH = os.path.join(CACHE_ROOT, "auth_snapshot.json")
+
+
+# 두 열만 읽으면 되므로 pandas 대신 csv 모듈로 읽습니다 (콜드 스타트 때 pandas import만 0.5초 이상 걸립니다).
+def parse_auth_csv(text):
+    rows = [row for row in csv.reader(io.StringIO(text.lstrip('\ufeff'))) if any(cell.strip() for cell in row)]
+    if not rows: return {}
+    header = [h.strip() for h in rows[0]]
+    code_i = next((i for i, c in enumerate(header) if '코드' in c or '입사일' in c), None)
+    name_i = next((i for i, c in enumerate(header) if '성명' in c or '이름' in c or '면접관' in c and i != code_i), None)
+
+    if code_i is None or name_i is None: return {}
+    users = {}
+    for row in rows[1:]:
+        code = re.sub(r'\.0*$', '', re.sub(r'\s+', '', row[code_i] if code_i < len(row) else '').replace(',', ''))
+        if code: users[code] = re.sub(r'\s+', '', row[name_i] if name_i < len(row) else '')
+    return users
+
+
+class AuthStore:
+    def __init__(self, url, ttl=300, timeout=10, failure_backoff=30, min_force_interval=10, snapshot_path=DEFAULT_SNAPSHOT_PATH):
+        self.url = url
+        self.ttl = ttl
+        self.failure_backoff = failure_backoff
+        self.min_force_interval = min_force_interval
+        self.timeout = timeout
+        self.snapshot_path = snapshot_path
+        self._index = {}
+        self._loaded_at = 0.0
+        self._failed_at = 0.0
+        self._attempted_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._load_snapshot()
+
+    # 스냅샷은 디스크 기준 시각을 유지하므로, 오래된 스냅샷이면 첫 조회 때 바로 백그라운드 갱신이 돕니다.
+    def _load_snapshot(self):
+        if not self.snapshot_path: return
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snap = json.load(f)
+            if snap.get("users"):
+                self._index = dict(snap["users"])
+                self._loaded_at = float(snap.get("saved_at", 0))
+        except (OSError, ValueError):
+            pass
+
+    def _save_snapshot(self, users, saved_at):
+        if not self.snapshot_path: return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp = f"{self.snapshot_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"saved_at": saved_at, "users": users}, f, ensure_ascii=False)
+            os.replace(tmp, self.snapshot_path)
+        except OSError:
+            pass
+
+    def _fetch(self):
+        fresh_url = f"{self.url}&_={int(time.time())}"
+        res = requests.get(fresh_url, timeout=self.timeout)
+        res.raise_for_status()
+        res.encoding = "utf-8"
+        return parse_auth_csv(res.text)
+
+    def refresh(self, force=False):
+        """시트를 다시 읽어 인덱스를 교체합니다. 실패하면 기존 인덱스를 유지하고 False를 돌려줍니다."""
+        with self._lock:
+            # 이미 받는 중이면 강제 갱신도 같은 요청을 또 보내지 않습니다.
+            if self._refreshing: return False
+            # 잘못된 코드를 연타해도 시트를 계속 두드리지 않도록 강제 갱신 간격을 둡니다.
+            # 간격은 성공 시각이 아니라 마지막 시도부터 재고, 시트가 죽어 쉬는 동안에는 강제 갱신도 하지 않습니다.
+            # (그러지 않으면 시트가 느리거나 죽었을 때 클릭마다 timeout초씩 로그인 화면이 멈춥니다.)
+            if force and (time.time() - self._attempted_at < self.min_force_interval or self._backing_off()): return False
+            self._attempted_at = time.time()
+            self._refreshing = True
+        with metrics.span("auth_fetch", forced=force) as s:
+            try:
+                users = self._fetch()
+            except Exception as e:
+                metrics.record_error("auth_fetch", e)
+                users = {}
+            finally:
+                with self._lock: self._refreshing = False
+            s.label(ok=bool(users))
+            s.set(users=len(users))
+        if not users:
+            self._failed_at = time.time()
+            return False
+
+        now = time.time()
+        with self._lock:
+            self._index = users
+            self._loaded_at = now
+        self._save_snapshot(users, now)
+        return True
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing: return
+        threading.Thread(target=self.refresh, daemon=True, name="auth-store-refresh").start()
+
+    def is_stale(self):
+        return time.time() - self._loaded_at > self.ttl
+
+    def _backing_off(self):
+        return time.time() - self._failed_at < self.failure_backoff
+
+    def get(self):
+        """code -> name 인덱스. 처음 한 번만 동기 로딩하고, 이후에는 I/O 없이 돌려줍니다."""
+        # 시트가 죽어 있을 때 rerun마다 타임아웃을 기다리지 않도록 실패 후 잠시 쉽니다.
+        if self._backing_off(): return self._index
+        if not self._index:
+            self.refresh()
+        elif self.is_stale():
+            self._refresh_in_background()
+        return self._index
+
+    def lookup(self, code):
+        return self.get().get(code)
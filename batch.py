@@ -0,0 +1,169 @@
+"""면접일 후보자 명단의 질문을 화면 없이 미리 일괄 생성합니다.
+
+    python batch.py slate.csv --out slate_questions.jsonl --api-key $GEMINI_API_KEY
+
+manifest는 CSV 또는 JSONL이며 열은 candidate, level, resume, portfolio(선택), jd_url, feedback(선택)입니다.
+파일 경로는 manifest 위치 기준입니다. 결과는 후보자당 한 줄씩 JSONL로 이어 쓰고, 결과 파일이 곧 체크포인트라서
+중단 후 같은 명령을 다시 실행하면 이미 성공한 후보자는 건너뜁니다.
+생성 결과는 화면과 같은 질문 캐시에도 들어가며, 화면 사이드바의 '미리 생성한 질문 불러오기'로 바로 열 수 있습니다.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+import metrics
+from gemini_client import limit_rate
+from jd_fetcher import JDFetcher
+from question_cache import QuestionCache, content_key
+from question_gen import CATEGORIES, LEVEL_GUIDELINES, QUESTIONS_PER_CATEGORY, is_complete, question_cache_key, request_all_questions
+from scheduler import GenerationScheduler
+
+MANIFEST_FIELDS = ["candidate", "level", "resume", "portfolio", "jd_url", "feedback"]
+
+
+class LocalFile:
+    """Streamlit UploadedFile 대신 쓰는 로컬 파일 (name, getvalue()만 필요합니다)."""
+
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f: self._data = f.read()
+
+    def getvalue(self):
+        return self._data
+
+
+def read_manifest(path):
+    with open(path, encoding="utf-8-sig") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")): rows = [json.loads(line) for line in f if line.strip()]
+        else: rows = list(csv.DictReader(f))
+    base = os.path.dirname(os.path.abspath(path))
+    entries, errors = [], []
+    for n, row in enumerate(rows, 1):
+        row = {k: (row.get(k) or "").strip() for k in MANIFEST_FIELDS}
+        if row["level"] not in LEVEL_GUIDELINES: errors.append(f"{n}행: 알 수 없는 레벨 '{row['level']}'")
+        if not row["jd_url"]: errors.append(f"{n}행: jd_url이 비어 있습니다")
+        for field in ("resume", "portfolio"):
+            if not row[field]: continue
+            row[field] = os.path.join(base, row[field])
+            if not os.path.isfile(row[field]): errors.append(f"{n}행: {field} 파일 없음 ({row[field]})")
+        if not row["resume"]: errors.append(f"{n}행: resume이 비어 있습니다")
+        entries.append(row)
+    if errors: raise ValueError("manifest 오류\n" + "\n".join(errors))
+    return entries
+
+
+def read_results(lines):
+    """결과 JSONL 줄들을 {id: 기록}으로 읽습니다. 같은 id는 나중 줄이 이깁니다. 깨진 줄(중단된 쓰기)은 건너뜁니다."""
+    records = {}
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("id"): records[record["id"]] = record
+    return records
+
+
+def entry_id(entry, resume, portfolio):
+    return content_key(entry["candidate"], entry["level"], entry["jd_url"], entry["feedback"], resume.getvalue(),
+                       portfolio.getvalue() if portfolio else None)[:16]
+
+
+def generate_entry(entry, resume, portfolio, api_key, fetcher, cache, on_item=None):
+    """(질문 dict, 캐시 사용 여부). 실패하면 예외를 올려 결과 파일에 error로 남깁니다."""
+    jd_text = fetcher.result(entry["jd_url"]) or entry["jd_url"]
+    key = question_cache_key("all", entry["level"], resume, jd_text, entry["feedback"], portfolio)
+    cached = cache.get(key)
+    if is_complete(cached): return cached, True
+    result = request_all_questions(api_key, entry["level"], resume, jd_text, entry["feedback"], portfolio)
+    if not isinstance(result, dict) or not any(result.values()): raise ValueError("응답에서 질문 JSON을 찾지 못했습니다.")
+    # 모자란 결과를 ok로 남기면 다시 실행해도 재시도하지 않으므로 실패로 기록합니다.
+    if not is_complete(result):
+        counts = ", ".join(f"{cat} {len(result.get(cat) or [])}/{QUESTIONS_PER_CATEGORY}" for cat in CATEGORIES)
+        raise ValueError(f"질문이 모자랍니다 ({counts})")
+    cache.put(key, result)
+    return result, False
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="면접 질문 일괄 생성")
+    p.add_argument("manifest")
+    p.add_argument("--out", help="결과 JSONL (기본: manifest 이름_questions.jsonl)")
+    p.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"))
+    p.add_argument("--workers", type=int, default=3, help="동시 호출 수")
+    p.add_argument("--rpm", type=int, default=30, help="분당 최대 Gemini 호출 수 (재시도/응답 복구 호출 포함)")
+    args = p.parse_args(argv)
+    if not args.api_key:
+        p.error("--api-key 또는 GEMINI_API_KEY 환경변수가 필요합니다.")
+
+    out = args.out or os.path.splitext(args.manifest)[0] + "_questions.jsonl"
+    try:
+        entries = read_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        p.error(str(e))
+    done = {}
+    if os.path.exists(out):
+        with open(out, encoding="utf-8") as f: done = read_results(f)
+        # 쓰다 끊긴 마지막 줄이 있으면 다음 기록이 그 줄에 붙지 않도록 줄을 바꿔 둡니다.
+        with open(out, "rb+") as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n": f.write(b"\n")
+
+    todo = {}
+    for entry in entries:
+        resume = LocalFile(entry["resume"])
+        portfolio = LocalFile(entry["portfolio"]) if entry["portfolio"] else None
+        eid = entry_id(entry, resume, portfolio)
+        if done.get(eid, {}).get("status") == "ok": continue
+        todo.setdefault(eid, (entry, resume, portfolio))
+    print(f"후보자 {len(entries)}명 중 {len(entries) - len(todo)}명은 이미 완료, {len(todo)}명 생성 시작 → {out}")
+    if not todo: return 0
+
+    # 후보자 하나가 재시도와 역량별 복구로 여러 번 부를 수 있으므로, 한도는 작업이 아니라 실제 호출마다 적용합니다.
+    limit_rate(args.api_key, args.rpm, burst=args.workers)
+    scheduler = GenerationScheduler(max_workers=args.workers, max_concurrent_per_key=args.workers, calls_per_minute=args.rpm, burst=args.workers)
+    fetcher, cache = JDFetcher(), QuestionCache()
+    started, futures = {}, {}
+    for eid, (entry, resume, portfolio) in todo.items():
+        started[eid] = time.time()
+        fut = scheduler.submit(eid, args.api_key, "batch", generate_entry, entry, resume, portfolio, args.api_key, fetcher, cache)
+        futures[fut] = eid
+
+    failed = 0
+    try:
+        with open(out, "a", encoding="utf-8") as f:
+            for n, fut in enumerate(as_completed(futures), 1):
+                eid = futures[fut]
+                entry = todo[eid][0]
+                record = {"id": eid, **{k: entry[k] for k in MANIFEST_FIELDS}, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                try:
+                    questions, cached = fut.result()
+                    record.update(status="ok", questions=questions, cached=cached)
+                except Exception as e:
+                    failed += 1
+                    record.update(status="error", error=f"{type(e).__name__}: {e}")
+                record["elapsed_s"] = round(time.time() - started[eid], 1)
+                # 한 줄씩 바로 디스크에 내려야 중단돼도 완료분이 남습니다.
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                print(f"[{n}/{len(todo)}] {entry['candidate'] or eid} ({entry['level']}) {record['status']} {record['elapsed_s']}s"
+                      + (f" - {record['error']}" if record["status"] == "error" else ""))
+    except KeyboardInterrupt:
+        for fut in futures: fut.cancel()
+        print("\n중단했습니다. 같은 명령을 다시 실행하면 남은 후보자부터 이어서 생성합니다. (진행 중인 요청이 끝나면 종료됩니다)")
+        return 130
+    finally:
+        # 화면 프로세스의 metrics.prom을 덮어쓰지 않도록 따로 씁니다.
+        metrics.write_file(os.path.join(metrics.CACHE_ROOT, "batch_metrics.prom"))
+    print(f"완료: 성공 {len(todo) - failed}명, 실패 {failed}명" + (" (다시 실행하면 실패한 후보자만 재시도합니다)" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# --- 벤치마크용 로컬 가짜 서버 ---
+# Gemini(generateContent / streamGenerateContent SSE / cachedContents), 면접관 시트 CSV, JD 페이지를 한 포트에서 흉내냅니다.
+# 지연(latency)과 오류 주입(429/500, 응답 없음, 중간에 잘린 JSON)을 설정할 수 있습니다.
+
+CATEGORIES = ["Transform", "Tomorrow", "Together"]
+AUTH_CODES = {f"2020{i:04d}": f"면접관{i}" for i in range(1, 51)}
+
+
+class FakeConfig:
+    def __init__(self, gemini_latency=1.0, chunk_delay=0.05, chunk_chars=24, error_rate=0.0, timeout_rate=0.0,
+                 retry_after=0.2, sheet_latency=0.3, jd_latency=0.3, malformed_rate=0.0, cache_min_tokens=1024, seed=0):
+        self.gemini_latency = gemini_latency
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.retry_after = retry_after
+        self.sheet_latency = sheet_latency
+        self.jd_latency = jd_latency
+        self.malformed_rate = malformed_rate
+        self.cache_min_tokens = cache_min_tokens
+        self.seed = seed
+
+
+def content_text(body):
+    """systemInstruction + contents의 텍스트. 토큰 수는 글자 수 / 2로 어림합니다."""
+    parts = body.get("systemInstruction", {}).get("parts", []) + [p for c in body.get("contents", []) for p in c.get("parts", [])]
+    return " ".join(p.get("text", "") for p in parts)
+
+
+def fake_answer(prompt):
+    """프롬프트가 역량별 요청이면 [...]를, 한 번에 요청이면 {"Transform": [...], ...}를 돌려줍니다."""
+    cat = re.search(r"\[Value\] (\w+)", prompt)
+    count = re.search(r"(\d+)개 질문", prompt)
+    def items(c, n): return [{"q": f"{c} 경험을 바탕으로 한 질문 {i + 1}입니다. 당시 어떤 판단을 하셨나요?", "i": f"{c} 역량 검증 {i + 1}"} for i in range(n)]
+    if cat: return json.dumps(items(cat.group(1), int(count.group(1)) if count else 5), ensure_ascii=False)
+    return json.dumps({c: items(c, 5) for c in CATEGORIES}, ensure_ascii=False)
+
+
+def jd_page(name):
+    body = " ".join(["담당업무: 클라우드 고객사 인프라 설계 및 운영 자동화.", "자격요건: 유관 경력 5년 이상, 협업 및 커뮤니케이션 역량."] * 20)
+    nav = " ".join(f"<a href='/menu/{i}'>메뉴 {i}</a>" for i in range(200))
+    return f"<html><head><meta charset='utf-8'><title>{name}</title></head><body><nav>{nav}</nav><main><div class='job-description'>{body}</div></main><footer>{'회사 소개 ' * 300}</footer></body></html>"
+
+
+def make_pdf(pages):
+    """텍스트만 있는 최소 PDF를 만듭니다 (이력서 업로드용)."""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 11 Tf 40 750 Td ({text}) Tj ET".encode("latin-1", "replace")
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R /Resources << /Font << /F1 3 0 R >> >> >>" % len(objs))
+        kids.append(len(objs))
+    objs[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    out, offsets = b"%PDF-1.4\n", []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i + 1, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1) + b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF" % (len(objs) + 1, xref)
+    return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = FakeConfig()
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+    stats = {"gemini": 0, "gemini_errors": 0, "sheet": 0, "jd": 0, "cache_create": 0, "cache_delete": 0}
+    caches = {}  # name -> 캐시된 텍스트
+
+    def log_message(self, *args): pass
+
+    def _send(self, status, body=b"", content_type="text/plain; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items(): self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats": return self._send(200, json.dumps(self.stats).encode(), "application/json")
+        if path == "/sheet.csv":
+            self.stats["sheet"] += 1
+            time.sleep(self.config.sheet_latency)
+            rows = ["면접관 코드,성명"] + [f"{c},{n}" for c, n in AUTH_CODES.items()]
+            return self._send(200, "\n".join(rows).encode("utf-8"), "text/csv; charset=utf-8")
+        if path.startswith("/jd/"):
+            self.stats["jd"] += 1
+            time.sleep(self.config.jd_latency)
+            if self.headers.get("If-None-Match") == '"jd-v1"': return self._send(304)
+            return self._send(200, jd_page(path[4:]).encode("utf-8"), "text/html; charset=utf-8", {"ETag": '"jd-v1"'})
+        self._send(404)
+
+    def do_DELETE(self):
+        name = urlparse(self.path).path.split("/v1beta/", 1)[-1]
+        if self.caches.pop(name, None) is None: return self._send(404, b'{"error": {"code": 404, "status": "NOT_FOUND"}}', "application/json")
+        self.stats["cache_delete"] += 1
+        self._send(200, b"{}", "application/json")
+
+    def _create_cache(self, body):
+        text = content_text(body)
+        tokens = len(text) // 2
+        if tokens < self.config.cache_min_tokens:
+            err = {"error": {"code": 400, "status": "INVALID_ARGUMENT", "message": f"Cached content is too small. total_token_count={tokens}, min_total_token_count={self.config.cache_min_tokens}"}}
+            return self._send(400, json.dumps(err).encode(), "application/json")
+        time.sleep(self.config.gemini_latency / 2)
+        with self.rng_lock:
+            self.stats["cache_create"] += 1
+            name = f"cachedContents/fake{self.stats['cache_create']}"
+            self.caches[name] = text
+        resp = {"name": name, "model": body.get("model"), "ttl": body.get("ttl"), "usageMetadata": {"totalTokenCount": tokens}}
+        self._send(200, json.dumps(resp).encode(), "application/json")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        path = urlparse(self.path).path
+        if path.endswith("/cachedContents"): return self._create_cache(body)
+        if ":generateContent" not in path and ":streamGenerateContent" not in path: return self._send(404)
+        self.stats["gemini"] += 1
+        cfg = self.config
+        with self.rng_lock: roll, malformed = self.rng.random(), self.rng.random() < self.config.malformed_rate
+        time.sleep(cfg.gemini_latency)
+        if roll < cfg.timeout_rate:
+            self.stats["gemini_errors"] += 1
+            time.sleep(120)
+            return
+        if roll < cfg.timeout_rate + cfg.error_rate:
+            self.stats["gemini_errors"] += 1
+            if roll < cfg.timeout_rate + cfg.error_rate / 2:
+                return self._send(429, json.dumps({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}).encode(), "application/json", {"Retry-After": str(cfg.retry_after)})
+            return self._send(500, b'{"error": {"code": 500}}', "application/json")
+
+        prompt = content_text(body)
+        cached = ""
+        if body.get("cachedContent"):
+            cached = self.caches.get(body["cachedContent"])
+            if cached is None: return self._send(404, b'{"error": {"code": 404, "status": "NOT_FOUND"}}', "application/json")
+        usage = {"promptTokenCount": (len(cached) + len(prompt)) // 2, "cachedContentTokenCount": len(cached) // 2}
+        text = fake_answer(prompt)
+        # 출력 토큰 한도에 걸린 것처럼 JSON을 중간에서 자릅니다.
+        if malformed: text = text[:int(len(text) * 0.6)]
+        if ":generateContent" in path:
+            resp = {"candidates": [{"content": {"parts": [{"text": text}]}}], "usageMetadata": {**usage, "candidatesTokenCount": len(text) // 2}}
+            return self._send(200, json.dumps(resp, ensure_ascii=False).encode("utf-8"), "application/json")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(text), cfg.chunk_chars):
+            event = {"candidates": [{"content": {"parts": [{"text": text[i:i + cfg.chunk_chars]}]}}]}
+            if i + cfg.chunk_chars >= len(text): event["usageMetadata"] = {**usage, "candidatesTokenCount": len(text) // 2}
+            data = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+            time.sleep(cfg.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(config, port_queue):
+    """별도 프로세스에서 실행합니다. 메모리 측정에 가짜 서버 할당이 섞이지 않게 하기 위함입니다."""
+    handler = type("Handler", (_Handler,), {"config": config, "rng": random.Random(config.seed), "stats": dict(_Handler.stats)})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    port_queue.put(server.server_port)
+    server.serve_forever()
@@ -0,0 +1,323 @@
+"""오프라인 종단간 벤치마크.
+
+가짜 Gemini / 면접관 시트 / JD 서버(fakes.py)를 띄우고, Streamlit AppTest로 app.py를 화면 없이 돌립니다.
+세션마다 로그인 → JD·이력서 입력 → 질문 생성 → 노트/메모/체크박스/보기 전환 순서로 진행하며 아래를 잽니다.
+
+    login_page_cold_ms  첫 로그인 화면 (시트를 처음 받는 비용 포함)
+    login_page_ms       이후 세션의 로그인 화면
+    login_submit_ms     인증 버튼 → 메인 화면
+    ttfq_ms             생성 버튼 → 첫 질문이 화면에 그려질 때까지
+    generation_ms       생성 버튼 → 모든 역량이 그려질 때까지
+    rerun_*_ms          상호작용별 스크립트 실행 시간 (fragment면 fragment만)
+    peak_mem_kb         한 세션 동안 파이썬 힙 최대 증가량 (tracemalloc, 별도 1회 측정)
+    cold_import_ms      새 인터프리터에서 streamlit 다음에 앱 모듈을 불러오는 시간 (콜드 스타트 중 앱 몫)
+    rss_per_session_kb  두 번째 세션부터 세션 하나(로그아웃까지)가 늘린 프로세스 RSS
+
+    python bench/run_bench.py                     # 측정 후 bench/baseline.json과 비교 (느려지면 exit 1)
+    python bench/run_bench.py --save-baseline     # 현재 결과를 기준값으로 저장
+    python bench/run_bench.py --gemini-latency 3 --error-rate 0.2 --mode single --no-stream
+    python bench/run_bench.py --no-context-cache  # 입력 토큰(prompt/cached)을 컨텍스트 캐시 없이 비교
+    python bench/run_bench.py --portfolio-mb 8    # 텍스트가 없는 큰 포트폴리오(원본 전송) 업로드 시 메모리
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), "app.py")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(1, os.path.dirname(BENCH_DIR))
+
+from fakes import AUTH_CODES, FakeConfig, make_pdf, serve  # noqa: E402
+
+# 시간 지표는 이 비율과 절대값(ms/KB)을 모두 넘어야 회귀로 봅니다. 짧은 rerun의 잡음을 걸러내기 위함입니다.
+DEFAULT_TOLERANCE = 0.25
+NOISE_FLOOR = 20
+RSS_NOISE_FLOOR = 2048  # RSS는 할당자가 메모리를 늦게 돌려주므로 2MB 이내 차이는 잡음으로 봅니다.
+APP_MODULES = ["metrics", "auth_store", "context_cache", "question_cache", "gemini_client", "documents", "jd_fetcher", "scheduler", "batch", "question_gen"]
+
+
+# --- AppTest 계측 ---
+# AppTest.run()의 벽시계 시간은 완료 대기(polling)가 섞이므로, 스크립트 스레드의 시작/종료 이벤트로 실행 시간을 잽니다.
+# fragment 안의 위젯을 건드리면 실제 브라우저처럼 그 fragment만 다시 돌도록 RerunData에 fragment id를 끼워 넣습니다.
+class ScriptTimer:
+    def __init__(self):
+        import streamlit.testing.v1.local_script_runner as lsr
+        from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+        from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+
+        self.last_ms = None
+        self.fragment_id = None
+        done = (ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS, ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR,
+                ScriptRunnerEvent.FRAGMENT_STOPPED_WITH_SUCCESS)
+        timer, orig_init = self, lsr.LocalScriptRunner.__init__
+
+        def init(runner, *args, **kwargs):
+            orig_init(runner, *args, **kwargs)
+            marks = {}
+
+            def on_event(sender, event, **_):
+                if event == ScriptRunnerEvent.SCRIPT_STARTED: marks["start"] = time.perf_counter()
+                elif event in done and "start" in marks: timer.last_ms = (time.perf_counter() - marks["start"]) * 1000
+            runner.on_event.connect(on_event, weak=False)
+
+        def rerun_data(**kwargs):
+            if timer.fragment_id: kwargs["fragment_id_queue"] = [timer.fragment_id]
+            return RerunData(**kwargs)
+
+        lsr.LocalScriptRunner.__init__ = init
+        lsr.RerunData = rerun_data
+
+    def run(self, at, fragment=None):
+        """at.run()을 하고 스크립트 실행 시간(ms)을 돌려줍니다. fragment는 함수 이름입니다."""
+        self.fragment_id = fragment_ids(at).get(fragment) if fragment else None
+        self.last_ms = None
+        try:
+            at.run()
+        finally:
+            self.fragment_id = None
+        return self.last_ms
+
+
+def fragment_ids(at):
+    """{fragment 함수 이름: fragment id}. AppTest 내부 저장소에서 감싼 함수를 찾아 이름을 붙입니다."""
+    ids = {}
+    for fid, wrapped in at._fragment_storage._fragments.items():
+        for cell in wrapped.__closure__ or []:
+            name = getattr(cell.cell_contents, "__name__", None)
+            if name and name.startswith("render_"): ids[name] = fid
+    return ids
+
+
+# --- 시나리오 ---
+def wait_until(cond, timeout):
+    end = time.time() + timeout
+    while not cond():
+        if time.time() > end: raise TimeoutError("벤치마크 대기 시간 초과")
+        time.sleep(0.01)
+
+
+def has_questions(ss):
+    return any(ss["generation_progress"].values()) or any(f.done() for f in ss["pending_generation"].values()) \
+        or any(q for q in ss["ai_questions"].values())
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure_cold_import(runs=3):
+    """앱 모듈 import 시간(ms)의 중앙값. 매번 새 인터프리터라 모듈 캐시가 없습니다."""
+    code = ("import sys, time; sys.path.insert(0, %r); import streamlit; t = time.perf_counter(); import %s; print((time.perf_counter() - t) * 1000)"
+            % (os.path.dirname(BENCH_DIR), ", ".join(APP_MODULES)))
+    return statistics.median(float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout) for _ in range(runs))
+
+
+def run_session(timer, args, port, idx):
+    from streamlit.testing.v1 import AppTest
+
+    m = {}
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    t = time.perf_counter(); at.run(); m["login_page_ms"] = (time.perf_counter() - t) * 1000
+
+    code = list(AUTH_CODES)[idx % len(AUTH_CODES)]
+    at.text_input[0].input(code)
+    at.text_input[1].input("bench-key")
+    at.button[0].click()
+    t = time.perf_counter(); at.run(); m["login_submit_ms"] = (time.perf_counter() - t) * 1000
+    if not at.session_state["authenticated"]: raise RuntimeError(f"로그인 실패: {[e.value for e in at.error]}")
+
+    # 같은 후보자 반복(--same-candidate)이 아니면 세션마다 다른 이력서라 질문 캐시에 걸리지 않습니다.
+    candidate = 0 if args.same_candidate else idx
+    resume = make_pdf([f"Candidate {candidate} resume page {p}. " + "Led cloud migration projects and mentored engineers. " * 6 for p in range(args.resume_pages)])
+    at.text_input(key="input_candidate").input(f"후보자{candidate}")
+    at.text_input(key="input_jd_url").input(f"http://127.0.0.1:{port}/jd/posting-{candidate}")
+    at.checkbox(key="input_agree").check()
+    at.checkbox(key="input_streaming").set_value(not args.no_stream)
+    at.radio(key="input_gen_mode").set_value("📦 한 번에 생성" if args.mode == "single" else "⚡ 역량별 동시 생성")
+    at.run()
+    at.file_uploader[0].upload("resume.pdf", resume, "application/pdf")
+    # 텍스트를 뽑을 수 없는 이미지 포트폴리오는 원본을 base64로 보내는 경로를 탑니다.
+    if args.portfolio_mb: at.file_uploader[1].upload("portfolio.jpg", os.urandom(int(args.portfolio_mb * 1024 * 1024)), "image/jpeg")
+    at.run()
+
+    start = time.perf_counter()
+    next(b for b in at.button if b.label.startswith("질문 생성")).click()
+    at.run()
+    if at.exception: raise RuntimeError(at.exception[0].message)
+    ss = at.session_state
+    wait_until(lambda: has_questions(ss), args.timeout)
+    at.run()
+    m["ttfq_ms"] = (time.perf_counter() - start) * 1000
+    wait_until(lambda: all(f.done() for f in ss["pending_generation"].values()), args.timeout)
+    at.run()
+    m["generation_ms"] = (time.perf_counter() - start) * 1000
+    if at.exception: raise RuntimeError(at.exception[0].message)
+    m["errors"] = sum(1 for qs in ss["ai_questions"].values() for q in qs[:1] if q["q"].startswith("🚨"))
+
+    # 상호작용마다 직전에 전체 실행을 한 번 해서 위젯 트리를 최신으로 맞춘 뒤 잽니다.
+    def interact(action, fragment=None):
+        samples = []
+        for i in range(args.repeat):
+            at.run()
+            action(i)
+            samples.append(timer.run(at, fragment))
+        return statistics.median(samples)
+
+    m["rerun_add_note_ms"] = interact(lambda i: at.button(key=f"add_Transform_{i % 5}").click())
+    m["rerun_memo_ms"] = interact(lambda i: at.text_area(key="am_0").input(f"메모 {i}"), "render_notes")
+    m["rerun_checkbox_ms"] = interact(lambda i: at.checkbox(key="chk_Tomorrow_1").set_value(i % 2 == 0), "render_questions")
+    views = ["↔️ 질문 리스트만 보기", "⬅️ 기본 보기 (반반)"]
+    m["rerun_view_ms"] = interact(lambda i: next(b for b in at.button if b.label == views[i % 2]).click())
+    # 실제 사용처럼 로그아웃으로 끝내서, 세션이 남기는 메모리에 정리 결과가 반영되게 합니다.
+    at.run()
+    next(b for b in at.button if b.label == "🚪 로그아웃").click()
+    at.run()
+    if at.session_state["authenticated"]: raise RuntimeError("로그아웃 실패")
+    return m
+
+
+def measure_memory(timer, args, port, idx):
+    """tracemalloc은 실행을 느리게 하므로 시간 측정과 따로 한 세션을 더 돌려 최대 증가량만 봅니다."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        run_session(timer, args, port, idx)
+        return (tracemalloc.get_traced_memory()[1] - base) / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(sessions, peak_kb):
+    keys = [k for k in sessions[0] if k != "errors"]
+    metrics = {k: statistics.median(s[k] for s in sessions) for k in keys}
+    metrics["login_page_cold_ms"] = sessions[0]["login_page_ms"]
+    if len(sessions) > 1: metrics["login_page_ms"] = statistics.median(s["login_page_ms"] for s in sessions[1:])
+    metrics["peak_mem_kb"] = peak_kb
+    return {k: round(v, 1) for k, v in sorted(metrics.items())}
+
+
+def compare(metrics, baseline, tolerance):
+    regressions = []
+    for key, base in baseline.items():
+        if key not in metrics: continue
+        cur = metrics[key]
+        mark = ""
+        floor = RSS_NOISE_FLOOR if key.startswith("rss") else NOISE_FLOOR
+        if cur > base * (1 + tolerance) and cur - base > floor:
+            mark = "  ⚠️ 회귀"
+            regressions.append(key)
+        print(f"  {key:20s} {base:10.1f} → {cur:10.1f} ({(cur - base) / base * 100 if base else 0:+.0f}%){mark}")
+    return regressions
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sessions", type=int, default=3)
+    p.add_argument("--repeat", type=int, default=5, help="상호작용별 반복 횟수 (중앙값 사용)")
+    p.add_argument("--mode", choices=["parallel", "single"], default="parallel")
+    p.add_argument("--no-stream", action="store_true")
+    p.add_argument("--same-candidate", action="store_true", help="모든 세션이 같은 후보자/이력서 (캐시 적중 측정)")
+    p.add_argument("--resume-pages", type=int, default=3)
+    p.add_argument("--portfolio-mb", type=float, default=0, help="이미지 포트폴리오 크기 (0이면 올리지 않음)")
+    p.add_argument("--gemini-latency", type=float, default=1.0)
+    p.add_argument("--chunk-delay", type=float, default=0.05)
+    p.add_argument("--error-rate", type=float, default=0.0, help="429/500 응답 비율")
+    p.add_argument("--timeout-rate", type=float, default=0.0, help="응답 없이 매달리는 요청 비율")
+    p.add_argument("--malformed-rate", type=float, default=0.0, help="JSON이 중간에 잘린 응답 비율")
+    p.add_argument("--no-context-cache", action="store_true", help="Gemini 컨텍스트 캐시를 끄고 매번 문서 전체를 보냄")
+    p.add_argument("--sheet-latency", type=float, default=0.3)
+    p.add_argument("--jd-latency", type=float, default=0.3)
+    p.add_argument("--timeout", type=float, default=180)
+    p.add_argument("--no-memory", action="store_true")
+    p.add_argument("--baseline", default=BASELINE_PATH)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = p.parse_args()
+
+    config = FakeConfig(gemini_latency=args.gemini_latency, chunk_delay=args.chunk_delay, error_rate=args.error_rate,
+                        timeout_rate=args.timeout_rate, sheet_latency=args.sheet_latency, jd_latency=args.jd_latency,
+                        malformed_rate=args.malformed_rate)
+    # 가짜 서버는 Streamlit을 불러오기 전에 별도 프로세스로 띄웁니다.
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(config, ports), daemon=True)
+    server.start()
+    port = ports.get(timeout=10)
+
+    cache_dir = tempfile.mkdtemp(prefix="bar-raiser-bench-")
+    os.environ["GEMINI_API_BASE"] = f"http://127.0.0.1:{port}/v1beta"
+    os.environ["BAR_RAISER_AUTH_URL"] = f"http://127.0.0.1:{port}/sheet.csv?sheet=bench"
+    os.environ["BAR_RAISER_CACHE_DIR"] = cache_dir
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    os.environ.setdefault("BAR_RAISER_LOG_LEVEL", "WARNING")
+    if args.no_context_cache: os.environ["BAR_RAISER_CONTEXT_CACHE"] = "0"
+
+    try:
+        cold_import_ms = measure_cold_import()
+        timer = ScriptTimer()
+        sessions, rss = [], []
+        for i in range(args.sessions):
+            sessions.append(run_session(timer, args, port, i))
+            rss.append(rss_kb())
+            print(f"session {i + 1}/{args.sessions}: " + ", ".join(f"{k}={v:.0f}" for k, v in sessions[-1].items()) + f", rss={rss[-1] / 1024:.0f}MB")
+        peak_kb = 0.0 if args.no_memory else measure_memory(timer, args, port, args.sessions)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5) as res: fake_stats = json.load(res)
+    finally:
+        server.terminate()
+
+    import metrics as app_metrics
+    print("구간별 (앱 계측):")
+    for name, m in sorted(app_metrics.snapshot().items()):
+        print(f"  {name:20s} n={m['count']:<5d} p50={m['p50_ms']:8.1f}ms p95={m['p95_ms']:8.1f}ms")
+    # prompt는 캐시에서 읽은 토큰을 포함한 전체 입력 토큰입니다.
+    tokens = {dict(labels).get("kind"): v for labels, v in app_metrics.counter_totals("gemini_tokens_total").items()}
+    prompt, cached = tokens.get("prompt", 0), tokens.get("cached", 0)
+    print(f"입력 토큰: 전체 {prompt:.0f} / 캐시 {cached:.0f} ({cached / prompt if prompt else 0:.0%}), 출력 {tokens.get('output', 0):.0f}, "
+          f"컨텍스트 캐시 생성 {fake_stats['cache_create']}회 / 삭제 {fake_stats['cache_delete']}회")
+
+    metrics = summarize(sessions, peak_kb)
+    metrics["cold_import_ms"] = round(cold_import_ms, 1)
+    # 첫 세션은 모듈 import와 공용 캐시 초기화가 섞이므로 두 번째 세션부터의 증가분만 봅니다.
+    if len(rss) > 1: metrics["rss_per_session_kb"] = round((rss[-1] - rss[0]) / (len(rss) - 1), 1)
+    metrics = dict(sorted(metrics.items()))
+    scenario = {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "tolerance", "timeout")}
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"scenario": scenario, "metrics": metrics}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"기준값 저장: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("기준값이 없습니다. --save-baseline으로 먼저 저장하세요.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("scenario") != scenario:
+        print("⚠️ 기준값과 시나리오 옵션이 다릅니다. 비교 결과는 참고용입니다.")
+    print(f"기준값 대비 (허용 {args.tolerance:.0%}):")
+    regressions = compare(metrics, baseline["metrics"], args.tolerance)
+    if regressions:
+        print(f"회귀: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import metrics
+from gemini_client import GEMINI_MODEL, GeminiError, create_cached_content, delete_cached_content
+
+# --- Gemini 컨텍스트 캐시 (cachedContents, 세션별) ---
+# 시스템 지침과 후보자 문서(JD/이력서/포트폴리오)를 Gemini 쪽에 한 번 올려 두고, 이후 호출은 handle(name)로 참조합니다.
+# 만드는 동안 화면을 기다리게 하지 않습니다: 준비되기 전 호출은 예전처럼 전체를 보내고, 준비된 뒤부터 handle을 씁니다.
+# 후보자가 바뀌거나 초기화하면 release()로 그 세션의 캐시를 지웁니다. 창을 그냥 닫은 세션은 서버 ttl이 지나면 사라집니다.
+# 너무 작은 문서처럼 캐시를 만들 수 없는 입력(400)은 ttl 동안, 그 밖의 실패는 negative_ttl 동안 다시 시도하지 않습니다.
+
+
+class ContextHandle:
+    """한 세션이 쓰는 한 후보자 입력의 캐시. name()은 기다리지 않고, 준비 전이면 None입니다."""
+
+    def __init__(self, cache, owner, key, api_key, build):
+        self._cache = cache
+        self._owner = owner
+        self._key = key
+        self._api_key = api_key
+        self._build = build
+
+    def name(self):
+        return self._cache.lookup(self._owner, self._key, self._api_key, self._build)
+
+    def invalidate(self, name):
+        self._cache.invalidate(self._owner, self._key, name)
+
+
+class ContextCache:
+    def __init__(self, ttl=1800, refresh_margin=60, negative_ttl=300):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.negative_ttl = negative_ttl
+        self._owners = {}  # owner(session_id) -> {key: entry}
+        self._lock = threading.Lock()
+
+    def handle(self, owner, key, api_key, build):
+        """build()는 (systemInstruction, contents)를 돌려주며, 캐시를 새로 만들 때만 불립니다."""
+        return ContextHandle(self, owner, key, api_key, build)
+
+    def lookup(self, owner, key, api_key, build):
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            entries = self._owners.setdefault(owner, {})
+            entry = entries.get(key)
+            if entry:
+                if entry['status'] == 'ok' and entry['expires_at'] - self.refresh_margin > now:
+                    metrics.count("context_cache_total", result="hit")
+                    return entry['name']
+                if entry['status'] == 'loading' or (entry['status'] == 'error' and entry['retry_at'] > now):
+                    metrics.count("context_cache_total", result="miss")
+                    return None
+            new = {'status': 'loading', 'name': None, 'api_key': api_key, 'expires_at': 0, 'retry_at': 0}
+            entries[key] = new
+        metrics.count("context_cache_total", result="miss")
+        # 곧 만료될 이전 캐시는 새 캐시를 만드는 동안 쓰지 않고 바로 지웁니다.
+        if entry and entry['name']: self._delete([entry])
+        threading.Thread(target=self._create, args=(owner, key, new, build), daemon=True, name="context-cache").start()
+        return None
+
+    def invalidate(self, owner, key, name):
+        """서버에서 이미 사라진 캐시(만료/삭제)를 잊습니다. 다음 lookup에서 다시 만듭니다."""
+        with self._lock:
+            entry = self._owners.get(owner, {}).get(key)
+            if entry and entry['name'] == name: del self._owners[owner][key]
+        metrics.count("context_cache_total", result="invalidated")
+
+    def release(self, owner):
+        """세션의 캐시를 모두 지웁니다 (후보자 변경/초기화). 서버 삭제는 백그라운드로 합니다."""
+        with self._lock:
+            entries = list(self._owners.pop(owner, {}).values())
+        self._delete([e for e in entries if e['name']])
+
+    def _prune(self, now):
+        for owner in list(self._owners):
+            entries = self._owners[owner]
+            for key in [k for k, e in entries.items() if e['status'] == 'ok' and e['expires_at'] <= now]: del entries[key]
+            if not entries: del self._owners[owner]
+
+    def _create(self, owner, key, entry, build):
+        started = time.time()
+        try:
+            system_instruction, contents = build()
+            body = {"model": f"models/{GEMINI_MODEL}", "systemInstruction": system_instruction, "contents": contents, "ttl": f"{self.ttl}s"}
+            data = create_cached_content(entry['api_key'], body)
+        except GeminiError as e:
+            metrics.count("context_cache_creates_total", status=e.status)
+            with self._lock: entry.update(status='error', retry_at=time.time() + (self.ttl if e.status == 400 else self.negative_ttl))
+            return
+        except Exception as e:
+            metrics.record_error("context_cache_create", e)
+            with self._lock: entry.update(status='error', retry_at=time.time() + self.negative_ttl)
+            return
+        metrics.count("context_cache_creates_total", status=200)
+        with self._lock:
+            entry.update(status='ok', name=data['name'], expires_at=started + self.ttl)
+            current = self._owners.get(owner, {}).get(key) is entry
+        # 만드는 사이에 release/invalidate됐으면 아무도 쓰지 않으므로 바로 지웁니다.
+        if not current: self._delete([entry])
+
+    def _delete(self, entries):
+        def run():
+            for e in entries:
+                try:
+                    delete_cached_content(e['api_key'], e['name'])
+                except GeminiError as ex:
+                    # 이미 만료된 캐시(404)는 지울 것이 없습니다. 나머지도 ttl이 지나면 서버에서 사라집니다.
+                    if ex.status != 404: metrics.record_error("context_cache_delete", ex)
+        if entries: threading.Thread(target=run, daemon=True, name="context-cache-delete").start()
@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict, namedtuple
+
+import metrics
+
+# --- 업로드 문서 전처리 ---
+# PDF는 원본을 base64로 통째로 보내지 않고 텍스트만 추출해서 보냅니다.
+# 빈 페이지/이미지뿐인 페이지는 버리고, 문서당 길이를 제한합니다.
+# 텍스트가 거의 안 나오는 경우(스캔본, 이미지 파일)에만 원본을 inline_data로 올립니다.
+# PyPDF2는 첫 PDF를 처리할 때 불러옵니다 (로그인 화면까지의 콜드 스타트 단축).
+
+MAX_PAGES = 40
+MAX_CHARS = 20000
+MIN_PAGE_CHARS = 30
+MIN_USEFUL_CHARS = 200
+
+# inline_bytes: 예전처럼 원본을 base64로 보냈을 때의 크기, sent_bytes: 실제로 보내는 크기
+PreparedDocument = namedtuple("PreparedDocument", ["part", "mode", "inline_bytes", "sent_bytes"])
+
+# 파일 해시별 전처리 결과. 원본 fallback은 base64 문자열을 들고 있으므로 개수가 아니라 크기로 제한합니다.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_bytes = 0
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 업로드 file_id -> sha256. Streamlit은 rerun마다 UploadedFile 객체를 새로 만들지만 file_id는 업로드마다 고정입니다.
+_digests = OrderedDict()
+MAX_DIGESTS = 256
+
+
+def upload_digest(f):
+    """업로드 파일 내용의 sha256. file_id가 있으면(Streamlit 업로드) 기억해 두고 rerun/호출마다 다시 해시하지 않습니다."""
+    file_id = getattr(f, "file_id", None)
+    with _cache_lock:
+        if file_id in _digests: return _digests[file_id]
+    digest = hashlib.sha256(f.getvalue()).hexdigest()
+    if file_id:
+        with _cache_lock:
+            _digests[file_id] = digest
+            while len(_digests) > MAX_DIGESTS: _digests.popitem(last=False)
+    return digest
+
+
+def discard(digest):
+    """한 파일의 전처리 결과를 캐시에서 지웁니다 (초기화/로그아웃 때 세션이 올린 파일 정리용)."""
+    global _cache_bytes
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == digest]: _cache_bytes -= _cache.pop(key).sent_bytes
+        for file_id in [i for i, d in _digests.items() if d == digest]: del _digests[file_id]
+
+
+def extract_pdf_text(data, max_pages=MAX_PAGES, max_chars=MAX_CHARS):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(data))
+    texts, total = [], 0
+    for page in reader.pages[:max_pages]:
+        text = " ".join((page.extract_text() or "").split())
+        if len(text) < MIN_PAGE_CHARS: continue
+        texts.append(text)
+        total += len(text)
+        if total >= max_chars: break
+    return "\n\n".join(texts)[:max_chars]
+
+
+def _inline_part(name, data):
+    mime = "application/pdf" if name.lower().endswith('pdf') else "image/jpeg"
+    with metrics.span("base64_encode") as s:
+        encoded = base64.b64encode(data).decode('utf-8')
+        s.set(file_bytes=len(data))
+    return {"inline_data": {"mime_type": mime, "data": encoded}}
+
+
+def prepare_document(label, name, data, max_chars=MAX_CHARS, digest=None):
+    """업로드 파일을 Gemini 요청용 part로 바꿉니다. 같은 파일(해시 기준)은 다시 추출하지 않습니다."""
+    key = (digest or hashlib.sha256(data).hexdigest(), label, max_chars)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            metrics.count("document_cache_hits_total")
+            return _cache[key]
+
+    with metrics.span("document_prepare") as s:
+        text = ""
+        if name.lower().endswith('pdf'):
+            try:
+                text = extract_pdf_text(data, max_chars=max_chars)
+            except Exception as e:
+                metrics.record_error("pdf_extract", e)
+                text = ""
+
+        inline_bytes = (len(data) + 2) // 3 * 4
+        if len(text) >= MIN_USEFUL_CHARS:
+            part = {"text": f"[{label} 내용]\n{text}"}
+            doc = PreparedDocument(part, "text", inline_bytes, len(part["text"].encode('utf-8')))
+        else:
+            part = _inline_part(name, data)
+            doc = PreparedDocument(part, "inline", inline_bytes, inline_bytes)
+        s.label(mode=doc.mode)
+        s.set(file_bytes=len(data), sent_bytes=doc.sent_bytes, inline_bytes=inline_bytes)
+
+    global _cache_bytes
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = doc
+            _cache_bytes += doc.sent_bytes
+        while _cache_bytes > CACHE_MAX_BYTES and len(_cache) > 1:
+            _cache_bytes -= _cache.popitem(last=False)[1].sent_bytes
+    return doc
+
+
+def format_size(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024 or unit == "MB": return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from scheduler import TokenBucket
+
+# --- Gemini API 호출 ---
+# GEMINI_API_BASE 환경변수로 엔드포인트를 바꿀 수 있어, 로컬 가짜 서버(녹화된 스트림 재생)로도 돌려볼 수 있습니다.
+
+GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+GEMINI_MODEL = "gemini-2.5-flash"
+
+
+def gemini_url(method, model=GEMINI_MODEL):
+    url = f"{GEMINI_API_BASE}/models/{model}:{method}"
+    return f"{url}?alt=sse" if method == "streamGenerateContent" else url
+
+
+def auth_headers(api_key):
+    # 키를 URL(?key=)에 넣으면 requests 예외 메시지와 로그에 그대로 찍히므로 헤더로 보냅니다.
+    return {'Content-Type': 'application/json', 'x-goog-api-key': api_key}
+
+
+class QuestionStreamParser:
+    """모델이 내보내는 JSON 텍스트를 조각 단위로 받아, {"q", "i"} 객체가 닫히는 즉시 꺼내줍니다.
+
+    최상위가 {"Transform": [...], ...} 형태면 해당 키를, [...] 형태면 None을 카테고리로 함께 돌려줍니다.
+    ```json 같은 앞뒤 텍스트는 무시합니다.
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._in_str = False
+        self._esc = False
+        self._str_buf = []
+        self._last_str = None
+        self._key = None
+        self._item = None
+        self._item_depth = 0
+        self._done = False
+
+    def feed(self, text):
+        out = []
+        for c in text:
+            if self._done: break
+            if not self._stack and c not in "{[": continue
+
+            if self._item is not None: self._item.append(c)
+
+            if self._in_str:
+                if self._esc: self._esc = False
+                elif c == "\\": self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if len(self._stack) == 1: self._last_str = "".join(self._str_buf)
+                elif len(self._stack) == 1: self._str_buf.append(c)
+            elif c == '"':
+                self._in_str = True
+                self._str_buf = []
+            elif c in "{[":
+                if c == "{" and self._item is None and self._stack and self._stack[-1] == "[":
+                    self._item = [c]
+                    self._item_depth = len(self._stack)
+                self._stack.append(c)
+            elif c in "}]":
+                if self._stack: self._stack.pop()
+                if self._item is not None and len(self._stack) == self._item_depth:
+                    obj = self._finish_item()
+                    if obj is not None: out.append((self._key, obj))
+                if not self._stack: self._done = True
+            elif c == ":" and self._stack == ["{"]:
+                self._key = self._last_str
+        return out
+
+    def _finish_item(self):
+        raw, self._item = "".join(self._item), None
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) and "q" in obj else None
+
+
+def iter_sse_text(res, usage=None):
+    """streamGenerateContent(alt=sse) 응답에서 텍스트 조각만 순서대로 꺼냅니다. usage dict를 주면 usageMetadata를 채웁니다."""
+    res.encoding = "utf-8"
+    for line in res.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"): continue
+        try:
+            chunk = json.loads(line[5:])
+        except ValueError:
+            continue
+        if usage is not None and chunk.get("usageMetadata"): usage.update(chunk["usageMetadata"])
+        text = candidate_text(chunk)
+        if text: yield text
+
+
+def candidate_text(data):
+    """응답(스트림이면 한 조각)의 첫 후보 텍스트. 안전 차단/MAX_TOKENS처럼 content.parts가 없으면 빈 문자열입니다."""
+    candidates = data.get("candidates") if isinstance(data, dict) else None
+    if not isinstance(candidates, list) or not candidates or not isinstance(candidates[0], dict): return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part["text"] for part in parts if isinstance(part, dict) and isinstance(part.get("text"), str))
+
+
+class GeminiError(Exception):
+    """재시도 후에도 실패한 호출. status는 HTTP 상태 코드이며, 네트워크 오류/타임아웃/잘린 응답이면 0입니다."""
+
+    def __init__(self, status, message=""):
+        super().__init__(message or f"Gemini 호출 실패 (status={status})")
+        self.status = status
+
+
+class CircuitOpenError(GeminiError):
+    """해당 API 키가 최근 연속으로 실패해서 잠시 호출을 막아둔 상태."""
+
+    def __init__(self, retry_in):
+        super().__init__(429, f"API 키 과부하로 {retry_in:.0f}초 동안 호출을 멈춥니다.")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """연속 실패가 threshold번 쌓이면 reset_timeout 동안 바로 실패시키고, 그 뒤 한 번만 시험 호출을 허용합니다."""
+
+    def __init__(self, threshold=3, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        with self._lock:
+            now = time.time()
+            if self._open_until > now: raise CircuitOpenError(self._open_until - now)
+            if self._failures >= self.threshold:
+                # half-open: 시험 호출 하나만 통과시킵니다.
+                if self._trial: raise CircuitOpenError(self.reset_timeout)
+                self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures, self._open_until, self._trial = 0, 0.0, False
+
+    def record_failure(self, hint=None):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._failures >= self.threshold:
+                self._open_until = time.time() + max(self.reset_timeout, hint or 0)
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_hint(res):
+    """Retry-After 헤더나 Gemini 오류 본문의 RetryInfo(retryDelay: "13s")에서 대기 시간을 읽습니다."""
+    header = res.headers.get("Retry-After")
+    if header:
+        try: return max(0.0, float(header))
+        except ValueError: pass
+    try:
+        for detail in res.json().get("error", {}).get("details", []):
+            delay = detail.get("retryDelay")
+            if delay and delay.endswith("s"): return float(delay[:-1])
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+
+class GeminiClient:
+    """keep-alive 연결을 재사용하는 공용 클라이언트. 지수 백오프+지터로 재시도하되 전체 deadline을 넘기지 않습니다."""
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=20.0, pool_size=16, breaker_threshold=3, breaker_reset=30):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._breakers = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, api_key):
+        key = hashlib.sha256(api_key.encode()).hexdigest()
+        with self._lock:
+            if key not in self._breakers: self._breakers[key] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return self._breakers[key]
+
+    def limit_rate(self, api_key, calls_per_minute, burst=1):
+        """이 키의 실제 HTTP 호출(재시도/복구 호출 포함)을 분당 calls_per_minute번으로 제한합니다.
+        한 작업이 몇 번 부를지 모르는 일괄 생성용입니다. 화면은 스케줄러가 요청 단위로 제한합니다."""
+        key = hashlib.sha256(api_key.encode()).hexdigest()
+        with self._lock: self._buckets[key] = TokenBucket(calls_per_minute / 60, burst)
+
+    def _throttle(self, api_key, end):
+        """limit_rate를 준 키면 다음 호출 차례까지 기다립니다. deadline 안에 차례가 오지 않으면 False."""
+        bucket = self._buckets.get(hashlib.sha256(api_key.encode()).hexdigest())
+        while bucket is not None:
+            with self._lock: delay = bucket.take()
+            if not delay: break
+            if time.time() + delay >= end: return False
+            time.sleep(delay)
+        return True
+
+    def _backoff(self, attempt, hint):
+        if hint is not None: return hint
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def generate(self, api_key, payload, timeout=60, deadline=90, on_item=None, default_key=None):
+        """응답 텍스트를 돌려줍니다. on_item을 주면 스트리밍으로 받으며 완성된 질문마다 on_item(카테고리, 질문)을 부릅니다."""
+        breaker = self.breaker(api_key)
+        method = "streamGenerateContent" if on_item else "generateContent"
+        url = gemini_url(method)
+        body = json.dumps(payload)
+        end = time.time() + deadline
+        status = 0
+        metrics.count("gemini_calls_total", method=method)
+
+        for attempt in range(self.max_attempts):
+            # deadline과 호출 한도 차례를 먼저 봅니다. half-open 시험 호출 자리를 잡아 놓고 부르지 않으면 차단기가 풀리지 않습니다.
+            if end - time.time() <= 0 or not self._throttle(api_key, end): break
+            try:
+                breaker.check()
+            except CircuitOpenError:
+                metrics.count("gemini_circuit_open_total")
+                raise
+            remaining = max(end - time.time(), 0.1)
+            if attempt: metrics.count("gemini_retries_total", method=method)
+            hint = None
+            # 시도마다 상태 코드, 요청 크기, 토큰 사용량(usageMetadata)을 남깁니다.
+            with metrics.span("gemini_attempt", method=method) as s:
+                s.set(attempt=attempt, payload_bytes=len(body))
+                try:
+                    res = self.session.post(url, headers=auth_headers(api_key), data=body, timeout=min(timeout, remaining), stream=bool(on_item))
+                except requests.RequestException as e:
+                    # 연결 오류/타임아웃뿐 아니라 잘린 본문(ChunkedEncodingError), 리다이렉트 반복 등도 실패로 셉니다.
+                    # 여기서 record_*를 건너뛰면 half-open 시험 호출이 끝나지 않은 채로 남아 이 키가 영영 막힙니다.
+                    status = 0
+                    s.set(error=type(e).__name__)
+                    breaker.record_failure()
+                else:
+                    with res:
+                        status = res.status_code
+                        if status == 200:
+                            breaker.record_success()
+                            usage = {}
+                            try:
+                                if not on_item:
+                                    try: data = res.json()
+                                    except ValueError: data = {}
+                                    usage = data.get('usageMetadata', {}) if isinstance(data, dict) else {}
+                                    # 텍스트가 없으면(안전 차단 등) 빈 응답으로 돌려줘서, 부르는 쪽이 깨진 응답처럼 다시 요청하게 합니다.
+                                    return candidate_text(data)
+                                # 스트림 도중 끊기면 이미 화면에 나간 질문이 있으므로 재시도하지 않고 실패로 돌려줍니다.
+                                try: return stream_questions(res, on_item, default_key, usage)
+                                except requests.RequestException as e: raise GeminiError(0, f"스트림 수신 실패 ({type(e).__name__})") from None
+                            finally:
+                                record_usage(s, usage)
+                        if status not in RETRY_STATUSES:
+                            # 키 오류/잘못된 요청은 재시도해도 소용없고, 과부하와도 무관하므로 차단기는 닫아둡니다.
+                            breaker.record_success()
+                            raise GeminiError(status)
+                        hint = retry_hint(res)
+                        breaker.record_failure(hint)
+                finally:
+                    s.label(status=status)
+
+            delay = self._backoff(attempt, hint)
+            # 기다려도 deadline 안에 다시 부를 수 없으면 화면을 붙잡고 있지 말고 바로 실패합니다.
+            if attempt == self.max_attempts - 1 or time.time() + delay >= end: break
+            time.sleep(delay)
+        metrics.count("gemini_failures_total", method=method, status=status)
+        raise GeminiError(status)
+
+    def create_cached_content(self, api_key, body, timeout=30):
+        """cachedContents를 만들고 응답(name, expireTime, usageMetadata)을 돌려줍니다. 실패해도 재시도하지 않습니다."""
+        with metrics.span("gemini_cache", op="create") as s:
+            try:
+                res = self.session.post(f"{GEMINI_API_BASE}/cachedContents", headers=auth_headers(api_key), json=body, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # requests 메시지에는 요청 URL이 들어가므로 예외 종류만 남깁니다.
+                s.label(status=0)
+                raise GeminiError(0, f"캐시 생성 실패 ({type(e).__name__})") from None
+            with res:
+                s.label(status=res.status_code)
+                if res.status_code != 200: raise GeminiError(res.status_code, res.text[:300])
+                data = res.json()
+            s.set(cached_tokens=data.get("usageMetadata", {}).get("totalTokenCount", 0))
+            return data
+
+    def delete_cached_content(self, api_key, name, timeout=10):
+        with metrics.span("gemini_cache", op="delete") as s:
+            try:
+                res = self.session.delete(f"{GEMINI_API_BASE}/{name}", headers=auth_headers(api_key), timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                s.label(status=0)
+                raise GeminiError(0, f"캐시 삭제 실패 ({type(e).__name__})") from None
+            with res:
+                s.label(status=res.status_code)
+                if res.status_code != 200: raise GeminiError(res.status_code, res.text[:300])
+
+
+def record_usage(s, usage):
+    """prompt는 캐시에서 읽은 토큰(cached)을 포함한 전체 입력입니다. 캐시로 아낀 비율은 cached / prompt로 봅니다."""
+    prompt, output = usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0)
+    cached = usage.get("cachedContentTokenCount", 0)
+    s.set(prompt_tokens=prompt, cached_tokens=cached, output_tokens=output)
+    metrics.count("gemini_tokens_total", prompt, kind="prompt")
+    metrics.count("gemini_tokens_total", cached, kind="cached")
+    metrics.count("gemini_tokens_total", output, kind="output")
+
+
+def stream_questions(res, on_item, default_key=None, usage=None):
+    """SSE 응답을 끝까지 읽으면서 완성된 질문마다 on_item(카테고리, 질문)을 부르고, 전체 텍스트를 돌려줍니다.
+    default_key(역량별 요청의 역량)가 있으면 모델이 {"questions": [...]}처럼 감싼 키 대신 항상 그 역량으로 알립니다."""
+    parser = QuestionStreamParser()
+    texts = []
+    for text in iter_sse_text(res, usage):
+        texts.append(text)
+        for key, obj in parser.feed(text):
+            on_item(default_key or key, obj)
+    return "".join(texts)
+
+
+_default_client = GeminiClient()
+
+
+def generate_text(api_key, payload, timeout=60, deadline=90, on_item=None, default_key=None):
+    return _default_client.generate(api_key, payload, timeout, deadline, on_item, default_key)
+
+
+def limit_rate(api_key, calls_per_minute, burst=1):
+    _default_client.limit_rate(api_key, calls_per_minute, burst)
+
+
+def create_cached_content(api_key, body, timeout=30):
+    return _default_client.create_cached_content(api_key, body, timeout)
+
+
+def delete_cached_content(api_key, name, timeout=10):
+    return _default_client.delete_cached_content(api_key, name, timeout)
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+
+import requests
+
+import metrics
+
+# --- JD(채용공고) 수집 ---
+# URL이 입력되면 백그라운드에서 바로 받아오고, 화면은 기다리지 않습니다.
+# 성공 결과는 ttl 동안 쓰고 이후에는 ETag/Last-Modified로 재검증(304면 그대로 사용)합니다.
+# 실패도 negative_ttl 동안 기억해서, 느리거나 깨진 URL을 rerun마다 다시 두드리지 않습니다.
+# 본문은 max_bytes까지만 내려받고, 메뉴/푸터 등을 걷어낸 채용공고 부분만 max_chars로 잘라 씁니다.
+# BeautifulSoup은 JD를 실제로 파싱할 때(수집 스레드) 처음 불러옵니다. JD 없이 쓰는 세션은 import 비용을 내지 않습니다.
+
+NOISE_TAGS = ['script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'iframe', 'svg', 'button']
+JD_HINTS = ['job-description', 'jobdescription', 'job_description', 'job-detail', 'jobdetail', 'posting', 'description', 'recruit', 'position', 'job']
+
+
+def _jsonld_job_description(soup):
+    """schema.org JobPosting(JSON-LD)이 있으면 그 description이 가장 깨끗한 본문입니다."""
+    from bs4 import BeautifulSoup
+    for tag in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(tag.string or "")
+        except ValueError:
+            continue
+        if isinstance(data, dict): data = data.get('@graph', [data])
+        for item in data if isinstance(data, list) else []:
+            if isinstance(item, dict) and item.get('@type') == 'JobPosting' and item.get('description'):
+                title = item.get('title', '')
+                desc = BeautifulSoup(item['description'], 'html.parser').get_text(separator=' ', strip=True)
+                return f"{title} {desc}".strip()
+    return None
+
+
+def extract_jd_text(html, max_chars=8000, from_encoding=None):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser', from_encoding=from_encoding)
+    text = _jsonld_job_description(soup)
+    if not text:
+        for s in soup(NOISE_TAGS): s.decompose()
+        root = soup.find('main') or soup.find('article') or soup.body or soup
+        # 채용공고 본문처럼 보이는 id/class 중 충분히 긴 영역이 있으면 그 부분만 씁니다.
+        for hint in JD_HINTS:
+            node = root.find(lambda t: any(hint in v.lower() for v in [t.get('id') or ''] + (t.get('class') or [])))
+            if node and len(node.get_text(strip=True)) > 200:
+                root = node
+                break
+        text = root.get_text(separator=' ', strip=True)
+    text = " ".join(text.split())
+    return text[:max_chars] if len(text) > 50 else None
+
+
+class JDFetcher:
+    def __init__(self, ttl=3600, negative_ttl=60, timeout=10, max_bytes=2 * 1024 * 1024, max_chars=8000, max_entries=256):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.max_entries = max_entries
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Mozilla/5.0'
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, url):
+        """필요하면 백그라운드 수집을 시작하고, 현재 항목을 돌려줍니다. 이미 받는 중이면 그대로 둡니다."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry:
+                age = time.time() - entry['fetched_at']
+                if entry['status'] == 'loading': return entry
+                if entry['status'] == 'ok' and age < self.ttl: return entry
+                if entry['status'] == 'error' and age < self.negative_ttl: return entry
+            new = {'status': 'loading', 'text': None, 'etag': None, 'last_modified': None, 'fetched_at': time.time(), 'done': threading.Event()}
+            if entry and entry['status'] == 'ok':
+                new.update(text=entry['text'], etag=entry['etag'], last_modified=entry['last_modified'])
+            self._entries[url] = new
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        threading.Thread(target=self._fetch, args=(url, new), daemon=True, name="jd-fetch").start()
+        return new
+
+    def peek(self, url):
+        """(status, text). 기다리지 않습니다. 재검증 중에는 이전 본문을 그대로 돌려줍니다."""
+        entry = self.prefetch(url)
+        return entry['status'], entry['text']
+
+    def result(self, url, wait=None):
+        entry = self.prefetch(url)
+        entry['done'].wait(self.timeout + 1 if wait is None else wait)
+        return entry['text'] if entry['status'] in ('ok', 'loading') else None
+
+    def _download(self, url, entry, s):
+        headers = {}
+        if entry['etag']: headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']: headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as res:
+                s.label(status=res.status_code)
+                if res.status_code == 304 and entry['text']:
+                    text = entry['text']
+                elif res.status_code == 200:
+                    body = bytearray()
+                    for chunk in res.iter_content(64 * 1024):
+                        body.extend(chunk)
+                        if len(body) >= self.max_bytes: break
+                    # 헤더에 charset이 없으면 인코딩 판별은 BeautifulSoup(meta charset 등)에 맡깁니다.
+                    charset = res.encoding if 'charset' in res.headers.get('Content-Type', '').lower() else None
+                    text = extract_jd_text(bytes(body[:self.max_bytes]), self.max_chars, charset)
+                    s.set(bytes=len(body), chars=len(text or ""))
+                else:
+                    text = None
+                entry.update(etag=res.headers.get('ETag', entry['etag']), last_modified=res.headers.get('Last-Modified', entry['last_modified']))
+        except Exception as e:
+            metrics.record_error("jd_fetch", e)
+            s.label(status=0)
+            text = None
+        return text
+
+    def _fetch(self, url, entry):
+        with metrics.span("jd_fetch", revalidate=bool(entry['text'])) as s:
+            text = self._download(url, entry, s)
+            s.label(result='ok' if text else 'error')
+        now = time.time()
+        if text:
+            entry.update(status='ok', text=text, fetched_at=now)
+        elif entry['text']:
+            # 재검증만 실패한 경우: 이전 본문을 계속 쓰고, negative_ttl 뒤에 다시 시도합니다.
+            entry.update(status='ok', fetched_at=now - self.ttl + self.negative_ttl)
+        else:
+            entry.update(status='error', fetched_at=now)
+        entry['done'].set()
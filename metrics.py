@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- 계측 (구간 시간 / 카운터) ---
+# span()으로 감싼 구간은 끝날 때 JSON 한 줄 로그(bar_raiser.metrics)를 남기고, 이름+라벨별로 최근 시간을 모읍니다.
+# 모인 값은 Prometheus 텍스트 형식(p50/p95 summary + counter)으로 파일에 주기적으로 쓰고,
+# BAR_RAISER_METRICS_PORT를 주면 http://127.0.0.1:PORT/metrics 로도 내보냅니다.
+# 라벨은 status처럼 값 종류가 적은 것만 쓰고, 바이트/토큰 수 같은 값은 로그 필드(set)로만 남깁니다.
+
+CACHE_ROOT = os.environ.get("BAR_RAISER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+DEFAULT_METRICS_PATH = os.path.join(CACHE_ROOT, "metrics.prom")
+PREFIX = "bar_raiser"
+QUANTILES = (0.5, 0.95)
+WINDOW = 1024  # 분위수는 시리즈별 최근 WINDOW개 기준입니다.
+
+log = logging.getLogger("bar_raiser.metrics")
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(os.environ.get("BAR_RAISER_LOG_LEVEL", "INFO"))
+    log.propagate = False
+
+_lock = threading.Lock()
+_timings = {}   # (name, labels) -> {"recent": deque, "count": int, "sum": float}
+_counters = {}  # (name, labels) -> float
+
+
+def _series(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = dict(labels)
+        self.fields = {}
+
+    def label(self, **labels):
+        self.labels.update(labels)
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+
+@contextmanager
+def span(name, **labels):
+    """with span("gemini_attempt", method="stream") as s: ... s.label(status=200); s.set(payload_bytes=...)"""
+    s = Span(name, labels)
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        # Streamlit의 rerun/stop도 예외로 빠져나오므로 이름만 남기고 그대로 올립니다.
+        s.label(error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(name, elapsed, **s.labels)
+        log.info(json.dumps({"ts": round(time.time(), 3), "span": name, "ms": round(elapsed * 1000, 1), **s.labels, **s.fields},
+                            ensure_ascii=False, default=str))
+
+
+def timed(name):
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def observe(name, seconds, **labels):
+    key = _series(name, labels)
+    with _lock:
+        t = _timings.get(key)
+        if t is None: t = _timings[key] = {"recent": deque(maxlen=WINDOW), "count": 0, "sum": 0.0}
+        t["recent"].append(seconds)
+        t["count"] += 1
+        t["sum"] += seconds
+
+
+def count(name, value=1, **labels):
+    key = _series(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def record_error(stage, exc):
+    """삼키던 예외를 기록합니다. 화면 동작은 그대로 두고, 로그에 traceback과 단계 이름을 남깁니다."""
+    count("errors_total", stage=stage, error=type(exc).__name__)
+    log.warning(json.dumps({"ts": round(time.time(), 3), "error": stage, "type": type(exc).__name__, "message": str(exc)[:500],
+                            "traceback": traceback.format_exception(exc)[-3:]}, ensure_ascii=False))
+
+
+def _quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def snapshot():
+    """{span 이름: {"count", "p50_ms", "p95_ms"}} (라벨 합산). 화면/벤치마크 요약용입니다."""
+    merged = {}
+    with _lock:
+        for (name, _), t in _timings.items():
+            merged.setdefault(name, {"count": 0, "recent": []})
+            merged[name]["count"] += t["count"]
+            merged[name]["recent"].extend(t["recent"])
+    out = {}
+    for name, m in merged.items():
+        values = sorted(m["recent"])
+        out[name] = {"count": m["count"], **{f"p{int(q * 100)}_ms": round(_quantile(values, q) * 1000, 1) for q in QUANTILES}}
+    return out
+
+
+def counter_totals(name):
+    """{라벨 dict를 정렬한 tuple: 값}. 화면/벤치마크 요약용입니다."""
+    with _lock:
+        return {labels: value for (n, labels), value in _counters.items() if n == name}
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        timings = {k: (sorted(v["recent"]), v["count"], v["sum"]) for k, v in _timings.items()}
+        counters = dict(_counters)
+    metric = f"{PREFIX}_span_seconds"
+    if timings:
+        lines += [f"# HELP {metric} 구간별 소요 시간 (분위수는 최근 {WINDOW}개 기준)", f"# TYPE {metric} summary"]
+    for (name, labels), (values, n, total) in sorted(timings.items()):
+        base = (("span", name),) + labels
+        for q in QUANTILES:
+            lines.append(f"{metric}{_fmt_labels(base, [('quantile', q)])} {_quantile(values, q):.6f}")
+        lines.append(f"{metric}_count{_fmt_labels(base)} {n}")
+        lines.append(f"{metric}_sum{_fmt_labels(base)} {total:.6f}")
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        full = f"{PREFIX}_{name}"
+        if full not in seen:
+            lines.append(f"# TYPE {full} counter")
+            seen.add(full)
+        lines.append(f"{full}{_fmt_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path=DEFAULT_METRICS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f: f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args): pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_exporter(path=DEFAULT_METRICS_PATH, interval=15, port=None):
+    """interval초마다 path에 쓰고, port(또는 BAR_RAISER_METRICS_PORT)가 있으면 /metrics 엔드포인트를 엽니다."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_file(path)
+            except OSError as e:
+                record_error("metrics_write", e)
+    threading.Thread(target=loop, daemon=True, name="metrics-export").start()
+
+    port = port or os.environ.get("BAR_RAISER_METRICS_PORT")
+    if port:
+        # 포트가 이미 쓰이고 있어도 화면은 띄우고 파일 내보내기는 계속합니다.
+        # 여기서 예외를 올리면 st.cache_resource가 결과를 기억하지 못해 rerun마다 다시 불리고 스레드가 쌓입니다.
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+        except OSError as e:
+            record_error("metrics_http", e)
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# --- 질문 생성 결과 캐시 (디스크, 모든 세션 공용) ---
+# 같은 이력서/포트폴리오/JD/레벨/전달사항으로 여러 면접관이 생성하면 Gemini를 다시 부르지 않습니다.
+# 키는 입력 내용과 프롬프트 버전의 해시이므로, 프롬프트를 고치면 PROMPT_VERSION만 올리면 됩니다.
+# 파일 mtime을 마지막 사용 시각으로 쓰고, 용량/기간을 넘으면 오래 안 쓴 것부터 지웁니다 (LRU).
+
+CACHE_ROOT = os.environ.get("BAR_RAISER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+DEFAULT_CACHE_DIR = os.path.join(CACHE_ROOT, "questions")
+
+
+def content_key(*parts):
+    """bytes/str/None 조각들을 순서대로 해시합니다. 조각 경계가 섞이지 않도록 길이를 함께 넣습니다."""
+    h = hashlib.sha256()
+    for p in parts:
+        if p is None: p = b""
+        elif isinstance(p, str): p = p.encode("utf-8")
+        h.update(len(p).to_bytes(8, "big"))
+        h.update(p)
+    return h.hexdigest()
+
+
+class QuestionCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=50 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created_at", 0) > self.max_age:
+            self._remove(path)
+            return None
+        try: os.utime(path)
+        except OSError: pass
+        return entry.get("value")
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "value": value}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            self._remove(tmp)
+            return
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith(".json"): continue
+                path = os.path.join(self.root, name)
+                try: info = os.stat(path)
+                except OSError: continue
+                entries.append((info.st_mtime, info.st_size, path))
+            entries.sort()
+            now = time.time()
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in entries:
+                if now - mtime <= self.max_age and total <= self.max_bytes: break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try: os.remove(path)
+        except OSError: pass
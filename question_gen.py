@@ -0,0 +1,256 @@
+import json
+import re
+
+import metrics
+from documents import prepare_document, upload_digest
+from gemini_client import GeminiError, QuestionStreamParser, generate_text
+from question_cache import content_key
+
+# --- 질문 생성 (프롬프트 구성 + 응답 파싱) ---
+# Streamlit 화면(app.py)과 일괄 생성 CLI(batch.py)가 같은 프롬프트/파싱/캐시 키를 쓰도록 여기에 모아 둡니다.
+# 업로드 파일은 name 속성과 getvalue()가 있으면 됩니다 (Streamlit UploadedFile 또는 batch.LocalFile).
+
+BAR_RAISER_CRITERIA = {
+    "Transform": "Enduring Value Creation (시간이 지날수록 더 큰 가치를 만들어내는 솔루션을 구축합니다.)",
+    "Tomorrow": "Forward Thinking (미래를 고려해 확장성과 지속성을 갖춘 솔루션을 구축합니다.)",
+    "Together": "Trust & Growth (서로의 발전을 지원하며 함께 성장합니다.)"
+}
+LEVEL_GUIDELINES = {
+    "IC-L3": "[기본기 확립 실무자] 명확한 지시와 가이드 하에 단기적 업무 수행. 피드백을 성장의 기회로 삼음.",
+    "IC-L4": "[자기완결성 독립 실무자] 외부 변수에 흔들리지 않고 스스로 계획 수립/해결. 협업 요청에 해결 지향적 대응.",
+    "IC-L5": "[핵심 직무 전문가] 복잡/다면적 문제 분석 및 최적 대안 제시. 자신의 전문성으로 팀 성과에 기여 및 후배에게 긍정적 영향.",
+    "IC-L6": "[선도적 전문가] 단일 유닛 성과를 넘어 부서 단위 확장(Scale-up) 시킴. 얽힌 복잡한 과제 리딩 및 이해관계자 설득.",
+    "IC-L7": "[전사 혁신 주도 최고 권위자] 비즈니스 혁신 창출 및 전사적 목표 달성에 기여. C-Level 및 외부 핵심 파트너와 담판.",
+    "M-L5": "[유닛 리더] 단일 기능 유닛 성장 주도. 구성원의 강점과 의견을 존중하고 심리적 안정감 구축.",
+    "M-L6": "[시니어 리더] 독립적 유닛 리딩. 단기 성과뿐만 아니라 구성원 장기 성장 지원. 건강한 갈등을 생산적 논의로 이끎.",
+    "M-L7": "[디렉터] 전사 전략 연계 중장기 로드맵 총괄. 신뢰 기반 권한 위임 및 전사 협력을 통한 시너지 창출."
+}
+
+CATEGORIES = ["Transform", "Tomorrow", "Together"]
+
+# 프롬프트/모델을 바꾸면 올려주세요. 질문 캐시 키에 들어가므로 이전 결과가 자동으로 무효화됩니다.
+PROMPT_VERSION = "gemini-2.5-flash/v5"
+QUESTIONS_PER_CATEGORY = 5
+
+# 구조화 출력(responseSchema): 모델이 자유 텍스트 대신 이 모양의 JSON만 내도록 강제합니다.
+QUESTION_SCHEMA = {"type": "OBJECT", "properties": {"q": {"type": "STRING"}, "i": {"type": "STRING"}}, "required": ["q", "i"], "propertyOrdering": ["q", "i"]}
+
+
+def questions_schema(count):
+    return {"type": "ARRAY", "items": QUESTION_SCHEMA, "minItems": count, "maxItems": count}
+
+
+ALL_QUESTIONS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {cat: questions_schema(QUESTIONS_PER_CATEGORY) for cat in CATEGORIES},
+    "required": CATEGORIES,
+    "propertyOrdering": CATEGORIES,
+}
+
+
+# 모든 호출에 공통인 지침은 systemInstruction으로 보냅니다. 후보자 문서와 함께 컨텍스트 캐시에 올라가는 부분입니다.
+SYSTEM_INSTRUCTION = "[Role] 당신은 메가존의 최고 수준 'Bar Raiser' 면접관입니다.\n[Core Values]\n" + "\n".join(
+    f"{n}. {cat}: {BAR_RAISER_CRITERIA[cat]}" for n, cat in enumerate(CATEGORIES, 1))
+
+
+# 파일은 내용 대신 해시(upload_digest)로 넣어, 호출마다 큰 파일을 다시 해시하지 않습니다.
+def question_cache_key(kind, level, resume_file, jd_text, tech_feedback, portfolio_file):
+    return content_key(PROMPT_VERSION, kind, level, jd_text, tech_feedback, upload_digest(resume_file), upload_digest(portfolio_file) if portfolio_file else None)
+
+
+def jd_part(jd_text):
+    return {"text": f"[JD 내용]\n{jd_text}"}
+
+
+def prepare_uploads(resume_file, portfolio_file):
+    docs = [prepare_document("이력서", resume_file.name, resume_file.getvalue(), digest=upload_digest(resume_file))]
+    if portfolio_file: docs.append(prepare_document("포트폴리오", portfolio_file.name, portfolio_file.getvalue(), digest=upload_digest(portfolio_file)))
+    return docs
+
+
+def context_parts(jd_text, resume_file, portfolio_file):
+    """호출마다 같은 후보자 입력(JD/이력서/포트폴리오) part들."""
+    return [jd_part(jd_text)] + [doc.part for doc in prepare_uploads(resume_file, portfolio_file)]
+
+
+def context_key(api_key, jd_text, resume_file, portfolio_file):
+    """컨텍스트 캐시 키. cachedContents는 API 키(프로젝트)별이라 키도 함께 넣습니다."""
+    return content_key(PROMPT_VERSION, api_key, SYSTEM_INSTRUCTION, jd_text, upload_digest(resume_file), upload_digest(portfolio_file) if portfolio_file else None)
+
+
+def context_content(jd_text, resume_file, portfolio_file):
+    """컨텍스트 캐시에 올릴 (systemInstruction, contents)."""
+    return {"parts": [{"text": SYSTEM_INSTRUCTION}]}, [{"role": "user", "parts": context_parts(jd_text, resume_file, portfolio_file)}]
+
+
+def build_payload(prompt, jd_text, resume_file, portfolio_file, schema=None, cached_content=None):
+    """cached_content(캐시 name)를 주면 지침/후보자 문서는 빼고 이번 요청의 프롬프트만 보냅니다."""
+    if cached_content:
+        data = {"cachedContent": cached_content, "contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    else:
+        parts = [{"text": prompt}] + context_parts(jd_text, resume_file, portfolio_file)
+        data = {"systemInstruction": {"parts": [{"text": SYSTEM_INSTRUCTION}]}, "contents": [{"role": "user", "parts": parts}]}
+    if schema: data["generationConfig"] = {"responseMimeType": "application/json", "responseSchema": schema}
+    return data
+
+
+def all_questions_prompt(level, tech_feedback="", has_portfolio=False):
+    level_desc = LEVEL_GUIDELINES.get(level, "")
+    feedback_instruction = f" [실무면접 전달사항 반영 필수]: {tech_feedback}." if tech_feedback else ""
+    portfolio_instruction = " 및 제출된 포트폴리오" if has_portfolio else ""
+    
+    # [프롬프트 핵심 수정] 맥락(배경)을 주되 2줄~2.5줄로 길이를 강력하게 통제합니다!
+    prompt = f"""
+    [Task] 지원자의 이력서와 JD{portfolio_instruction}를 분석하여, 3가지 Core Value(Transform, Tomorrow, Together)를 검증하는 행동 기반 면접 질문을 각각 5개씩 총 15개 생성하세요.
+
+    [CRITICAL RULES - MUST OBEY]
+    1. (직급/레벨 언급 절대 금지) 질문 내용에 지원자의 지원 레벨({level}), 직급, 연차를 절대 직접적으로 언급하거나 암시하지 마세요. (예: "L5로서~", "리더로서~" 같은 표현 절대 금지) 
+    2. 절대 실무 능력이나 기술적 지식(Hard Skill)을 묻지 마세요.
+    3. (맥락 있는 질문) 갑자기 질문만 던지지 말고, 이력서나 포트폴리오에 적힌 지원자의 특정 경험이나 프로젝트를 먼저 가볍게 언급하며 왜 이 질문을 하는지 자연스러운 배경을 깔아주세요. (예: "이력서를 보니 OOO 프로젝트를 진행하셨던데~")
+    4. (분량 제한) 면접관이 대본으로 자연스럽게 바로 읽을 수 있는 편안한 구어체로 쓰되, 전체 길이는 반드시 **2줄 (최대 2.5줄)**을 넘지 않게 간결함을 유지하세요.
+    5. 겉으로는 티 내지 않되, 내부적으로는 지원자의 요구 역량 수준({level_desc})에 맞는 깊이와 시야를 검증할 수 있는 난이도로 질문을 구성하세요.
+    6. {feedback_instruction}
+    
+    [Output Format] 
+    반드시 아래 JSON 형식으로만 응답하세요.
+    {{
+        "Transform": [ {{"q": "경험을 언급하며 맥락을 부여한 2줄짜리 자연스러운 질문", "i": "명확한 의도 (1줄)"}}, ...5개 ],
+        "Tomorrow": [ {{"q": "경험을 언급하며 맥락을 부여한 2줄짜리 자연스러운 질문", "i": "명확한 의도 (1줄)"}}, ...5개 ],
+        "Together": [ {{"q": "경험을 언급하며 맥락을 부여한 2줄짜리 자연스러운 질문", "i": "명확한 의도 (1줄)"}}, ...5개 ]
+    }}
+    """
+    return prompt
+
+
+def category_prompt(category, level, tech_feedback="", has_portfolio=False, count=5, avoid=()):
+    level_desc = LEVEL_GUIDELINES.get(level, "")
+    value_desc = BAR_RAISER_CRITERIA[category]
+    feedback_instruction = f" [실무면접 전달사항 반영 필수]: {tech_feedback}." if tech_feedback else ""
+    portfolio_instruction = " 및 제출된 포트폴리오" if has_portfolio else ""
+    
+    prompt = f"""
+    [Value] {category} : {value_desc}
+    [Task] 이력서와 JD{portfolio_instruction} 분석. {count}개 질문 JSON 생성: [{{'q': '질문', 'i': '의도'}}]. 
+    
+    [CRITICAL RULES]
+    1. (직급/레벨 금지) 질문에 레벨({level}), 직급, 연차를 절대 직접 언급하거나 티 내지 마세요.
+    2. (맥락 포함 & 분량 제한) 이력서/포트폴리오의 구체적 경험을 가볍게 언급하여 질문의 배경을 설명하되, 전체 길이는 **2줄(최대 2.5줄)** 이내의 자연스러운 구어체 대본으로 작성하세요.
+    3. Hard Skill 금지. 겉으로 티는 안 나지만 역량 수준({level_desc})에 맞는 난이도의 상황을 물어보세요.
+    4. {feedback_instruction}
+    """
+    if avoid:
+        # 일부만 다시 뽑을 때는 이미 있는 질문과 겹치지 않게 알려줍니다.
+        prompt += "\n    5. 아래 질문들과 겹치지 않는 새로운 질문만 작성하세요:\n" + "\n".join(f"    - {q}" for q in avoid) + "\n"
+    return prompt
+
+
+def clean_questions(items):
+    """{"q", "i"} 모양이고 질문이 비어 있지 않은 항목만 남깁니다."""
+    out = []
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get("q"), str) and item["q"].strip():
+            out.append({"q": item["q"].strip(), "i": str(item.get("i") or "").strip()})
+    return out
+
+
+def _parse(raw, kind):
+    """(데이터, 엄격 파싱 성공 여부). 깨지거나 잘린 JSON이면 완성된 질문 객체만 건진 [(최상위 키, 질문)]을 돌려줍니다."""
+    with metrics.span("json_parse", kind=kind) as s:
+        s.set(chars=len(raw))
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw.strip())
+        try:
+            data = json.loads(text)
+            s.label(result="ok")
+            return data, True
+        except ValueError:
+            items = QuestionStreamParser().feed(text)
+            s.label(result="salvaged" if items else "failed")
+            s.set(salvaged=len(items))
+            return items, False
+
+
+def parse_all_questions(raw):
+    """({역량: [질문]}, 엄격 파싱 성공 여부). 빠진 역량은 빈 리스트입니다."""
+    data, strict = _parse(raw, "all")
+    if strict:
+        return {cat: clean_questions(data.get(cat)) if isinstance(data, dict) else [] for cat in CATEGORIES}, True
+    result = {cat: [] for cat in CATEGORIES}
+    for key, item in data:
+        if key in result: result[key] += clean_questions([item])
+    return result, False
+
+
+def parse_category_questions(raw):
+    data, strict = _parse(raw, "category")
+    if not strict: data = [item for _, item in data]
+    # 모델이 {"questions": [...]}처럼 한 번 감싸서 준 경우
+    elif isinstance(data, dict): data = next((v for v in data.values() if isinstance(v, list)), [])
+    return clean_questions(data), strict
+
+
+def is_complete(result):
+    """세 역량이 모두 QUESTIONS_PER_CATEGORY개씩 찼는지. 복구가 실패해 모자란 결과는 보여주기만 하고 캐시/일괄 완료로 남기지 않습니다."""
+    return isinstance(result, dict) and all(len(result.get(cat) or []) >= QUESTIONS_PER_CATEGORY for cat in CATEGORIES)
+
+
+def _generate(api_key, prompt, jd_text, resume_file, portfolio_file, schema, context=None, **kwargs):
+    """context(ContextHandle)에 준비된 캐시가 있으면 handle로 보내고, 서버에서 사라진 캐시면 전체를 다시 보냅니다."""
+    name = context.name() if context else None
+    if name:
+        try:
+            return generate_text(api_key, build_payload(prompt, jd_text, resume_file, portfolio_file, schema, name), **kwargs)
+        except GeminiError as e:
+            # 만료/삭제된 캐시는 400/403/404로 옵니다. 스트림이 시작되기 전이라 화면에 나간 질문은 없습니다.
+            if e.status not in (400, 403, 404): raise
+            context.invalidate(name)
+    return generate_text(api_key, build_payload(prompt, jd_text, resume_file, portfolio_file, schema), **kwargs)
+
+
+# 네트워크/429/5xx 재시도는 클라이언트가 맡습니다. 응답이 깨졌을 때는 건질 수 있는 질문은 살리고,
+# 모자란 역량/개수만 역량별 요청으로 채웁니다. 전체를 다시 부르는 건 하나도 못 건졌을 때뿐입니다.
+# 하나도 못 만들면 None을, 첫 호출 자체가 실패하면 GeminiError를 그대로 올립니다.
+# context(ContextHandle)를 주면 후보자 문서를 매번 보내는 대신 Gemini 컨텍스트 캐시를 참조합니다.
+def request_all_questions(api_key, level, resume_file, jd_text, tech_feedback="", portfolio_file=None, on_item=None, context=None):
+    prompt = all_questions_prompt(level, tech_feedback, bool(portfolio_file))
+    call = lambda: _generate(api_key, prompt, jd_text, resume_file, portfolio_file, ALL_QUESTIONS_SCHEMA, context, timeout=90, deadline=120, on_item=on_item)
+    result, strict = parse_all_questions(call())
+    if not any(result.values()):
+        metrics.count("json_repairs_total", scope="full")
+        result, strict = parse_all_questions(call())
+        if not any(result.values()): return None
+
+    short = {cat: QUESTIONS_PER_CATEGORY - len(result[cat]) for cat in CATEGORIES if len(result[cat]) < QUESTIONS_PER_CATEGORY}
+    for cat, n in short.items():
+        result[cat] += _repair(api_key, cat, level, resume_file, jd_text, tech_feedback, portfolio_file, n, on_item, result[cat], context)
+    if (short or not strict) and all(result.values()): metrics.count("parse_failures_avoided_total", kind="all")
+    return {cat: items[:QUESTIONS_PER_CATEGORY] for cat, items in result.items()}
+
+
+def request_category_questions(api_key, category, level, resume_file, jd_text, tech_feedback="", portfolio_file=None, count=5, on_item=None, avoid=(), context=None):
+    prompt = category_prompt(category, level, tech_feedback, bool(portfolio_file), count, avoid)
+    call = lambda: _generate(api_key, prompt, jd_text, resume_file, portfolio_file, questions_schema(count), context, timeout=60, deadline=75, on_item=on_item, default_key=category)
+    items, strict = parse_category_questions(call())
+    if not items:
+        metrics.count("json_repairs_total", scope="full")
+        items, strict = parse_category_questions(call())
+        if not items: return None
+
+    missing = count - len(items)
+    if missing > 0:
+        items += _repair(api_key, category, level, resume_file, jd_text, tech_feedback, portfolio_file, missing, on_item, list(avoid) + items, context)
+    if (missing > 0 or not strict) and items: metrics.count("parse_failures_avoided_total", kind="category")
+    return items[:count]
+
+
+def _repair(api_key, category, level, resume_file, jd_text, tech_feedback, portfolio_file, count, on_item, existing, context=None):
+    """모자란 count개만 한 번 더 요청합니다. 실패해도 이미 건진 질문은 살리도록 빈 리스트를 돌려줍니다."""
+    metrics.count("json_repairs_total", scope="partial")
+    avoid = [q["q"] if isinstance(q, dict) else q for q in existing]
+    prompt = category_prompt(category, level, tech_feedback, bool(portfolio_file), count, avoid)
+    try:
+        items, _ = parse_category_questions(_generate(api_key, prompt, jd_text, resume_file, portfolio_file, questions_schema(count), context,
+                                                      timeout=60, deadline=75, on_item=on_item, default_key=category))
+    except GeminiError as e:
+        metrics.record_error("json_repair", e)
+        return []
+    return [q for q in items if q["q"] not in avoid][:count]
@@ -0,0 +1,203 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# --- 생성 요청 스케줄러 (프로세스 공용) ---
+# 모든 세션의 생성 요청이 여기를 거칩니다.
+# - single-flight: 같은 API 키로 같은 요청(flight_key)이 이미 대기/실행 중이면 새로 부르지 않고 그 결과를 같이 받습니다.
+#   스트리밍 중이면 이미 도착한 질문부터 다시 넘겨준 뒤 이어서 받습니다.
+#   키가 다르면 합치지 않습니다. 다른 사람의 한도/대기열을 쓰거나 그 키의 오류(잘못된 키, 차단기)를 같이 받게 되기 때문입니다.
+# - API 키별로 동시 실행 수와 토큰 버킷(분당 호출 수, 순간 burst)을 제한합니다.
+# - 한도를 넘은 요청은 키별 대기열에 쌓이고, 세션 간에는 라운드 로빈으로 꺼내 한 세션이 키를 독차지하지 못하게 합니다.
+# - background 요청(예비 질문 미리 받기 등)은 그 키에 기다리는 요청이 없을 때 한 번에 하나씩만 내보내고,
+#   실행 슬롯 하나와 burst 토큰을 남겨 두어 바로 뒤에 오는 사용자 요청을 늦추지 않게 합니다.
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def take(self, reserve=0):
+        """토큰을 하나 쓰면 0을, 모자라면 다음 토큰까지 남은 초를 돌려줍니다. reserve개는 쓰지 않고 남겨 둡니다."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1 + reserve:
+            self._tokens -= 1
+            return 0.0
+        return (1 + reserve - self._tokens) / self.rate
+
+
+class _Job:
+    def __init__(self, flight_key, key_hash, session_id, fn, args, stream, background=False):
+        self.flight_key = flight_key
+        self.key_hash = key_hash
+        self.session_id = session_id
+        self.fn = fn
+        self.args = args
+        self.stream = stream
+        self.background = background
+        self.items = []
+        self.waiters = []  # (future, on_item)
+        self.running = False
+
+
+class _KeyState:
+    def __init__(self, rate, capacity):
+        self.bucket = TokenBucket(rate, capacity)
+        self.running = 0
+        self.background_running = 0
+        self.sessions = OrderedDict()  # session_id -> deque[_Job], 앞쪽 세션 차례
+        self.background = deque()
+
+
+class GenerationScheduler:
+    def __init__(self, max_workers=8, max_concurrent_per_key=3, calls_per_minute=30, burst=3):
+        self.max_concurrent_per_key = max_concurrent_per_key
+        self.rate = calls_per_minute / 60
+        self.burst = burst
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="question-gen")
+        self._keys = {}
+        self._flights = {}
+        self._cond = threading.Condition()
+        threading.Thread(target=self._dispatch_loop, daemon=True, name="question-scheduler").start()
+
+    def submit(self, flight_key, api_key, session_id, fn, *args, on_item=None, background=False):
+        """fn(*args, on_item=...)를 예약하고 이 호출자 전용 Future를 돌려줍니다.
+
+        Future를 cancel()하면 이 호출자만 빠지며, 아무도 기다리지 않는 대기 요청은 대기열에서 지워집니다.
+        """
+        fut = Future()
+        key_hash = hashlib.sha256((api_key or "").encode()).hexdigest()
+        flight = (key_hash, flight_key)
+        with self._cond:
+            job = self._flights.get(flight)
+            if job is None:
+                job = _Job(flight, key_hash, session_id, fn, args, stream=on_item is not None, background=background)
+                self._flights[flight] = job
+                state = self._key_state(key_hash)
+                if background: state.background.append(job)
+                else: state.sessions.setdefault(session_id, deque()).append(job)
+                self._cond.notify()
+            else:
+                if job.background and not background and not job.running:
+                    # 누군가 직접 기다리게 된 background 요청은 일반 대기열로 올립니다.
+                    state = self._keys[job.key_hash]
+                    state.background.remove(job)
+                    state.sessions.setdefault(job.session_id, deque()).append(job)
+                    job.background = False
+                    self._cond.notify()
+                if on_item:
+                    for key, obj in job.items: on_item(key, obj)
+            job.waiters.append((fut, on_item))
+        fut.add_done_callback(lambda f: f.cancelled() and self._detach(job, f))
+        return fut
+
+    def status(self, fut):
+        """('queued', 앞에 남은 요청 수) / ('running', 0) / ('done', 0)."""
+        if fut.done(): return 'done', 0
+        with self._cond:
+            for job in self._flights.values():
+                if not any(f is fut for f, _ in job.waiters): continue
+                if job.running: return 'running', 0
+                return 'queued', self._ahead(job)
+        return 'done', 0
+
+    def queue_depth(self, api_key=None):
+        """(실행 중, 대기 중) 요청 수. api_key를 주면 그 키만 셉니다."""
+        with self._cond:
+            if api_key is not None:
+                state = self._keys.get(hashlib.sha256(api_key.encode()).hexdigest())
+                states = [state] if state else []
+            else:
+                states = list(self._keys.values())
+            return sum(s.running for s in states), sum(len(q) for s in states for q in s.sessions.values())
+
+    def _key_state(self, key_hash):
+        if key_hash not in self._keys: self._keys[key_hash] = _KeyState(self.rate, self.burst)
+        return self._keys[key_hash]
+
+    def _ahead(self, job):
+        """라운드 로빈 순서로 이 요청보다 먼저 나갈 요청 수."""
+        state = self._keys[job.key_hash]
+        if job.background: return sum(len(q) for q in state.sessions.values()) + state.background.index(job)
+        order = list(state.sessions.items())
+        pos = next(i for i, (sid, _) in enumerate(order) if sid == job.session_id)
+        idx = order[pos][1].index(job)
+        return idx + sum(min(len(q), idx + (1 if i < pos else 0)) for i, (_, q) in enumerate(order) if i != pos)
+
+    def _detach(self, job, fut):
+        with self._cond:
+            job.waiters = [(f, cb) for f, cb in job.waiters if f is not fut]
+            if job.waiters or job.running: return
+            state = self._keys[job.key_hash]
+            if job in state.background: state.background.remove(job)
+            queue = state.sessions.get(job.session_id)
+            if queue and job in queue:
+                queue.remove(job)
+                if not queue: del self._keys[job.key_hash].sessions[job.session_id]
+            self._flights.pop(job.flight_key, None)
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                wait = None
+                for state in self._keys.values():
+                    while state.sessions and state.running < self.max_concurrent_per_key:
+                        delay = state.bucket.take()
+                        if delay:
+                            wait = delay if wait is None else min(wait, delay)
+                            break
+                        session_id, queue = next(iter(state.sessions.items()))
+                        job = queue.popleft()
+                        # 꺼낸 세션은 맨 뒤로 보내 다른 세션에게 차례를 넘깁니다.
+                        del state.sessions[session_id]
+                        if queue: state.sessions[session_id] = queue
+                        if not self._start(job, state): return
+                    if state.background and not state.sessions and not state.background_running and state.running < self.max_concurrent_per_key - 1:
+                        delay = state.bucket.take(reserve=self.burst - 1)
+                        if delay:
+                            wait = delay if wait is None else min(wait, delay)
+                            continue
+                        job = state.background.popleft()
+                        state.background_running += 1
+                        if not self._start(job, state): return
+                self._cond.wait(wait)
+
+    def _start(self, job, state):
+        job.running = True
+        state.running += 1
+        try:
+            self._executor.submit(self._run, job, state)
+        except RuntimeError:
+            # 인터프리터 종료 중이면 executor가 이미 닫혀 있습니다. 남은 요청은 버리고 조용히 멈춥니다.
+            return False
+        return True
+
+    def _broadcast(self, job, key, obj):
+        with self._cond:
+            job.items.append((key, obj))
+            callbacks = [cb for _, cb in job.waiters if cb]
+        for cb in callbacks: cb(key, obj)
+
+    def _run(self, job, state):
+        on_item = (lambda key, obj: self._broadcast(job, key, obj)) if job.stream else None
+        try:
+            result, error = job.fn(*job.args, on_item=on_item), None
+        except Exception as e:
+            result, error = None, e
+        with self._cond:
+            state.running -= 1
+            if job.background: state.background_running -= 1
+            self._flights.pop(job.flight_key, None)
+            waiters = list(job.waiters)
+            self._cond.notify()
+        for fut, _ in waiters:
+            if not fut.set_running_or_notify_cancel(): continue
+            if error is not None: fut.set_exception(error)
+            else: fut.set_result(result)
@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# --- 테스트 공용 ---
+# 저장소 루트의 모듈(gemini_client 등)을 그대로 불러오고, Gemini는 로컬 가짜 서버(GeminiStub)로 대신합니다.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+REPLAY_CHUNK_BYTES = 7  # 녹화된 스트림을 일부러 잘게(UTF-8 글자 중간에서도) 나눠 보냅니다.
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args): pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        stub = self.server.stub
+        with stub.lock:
+            stub.paths.append(self.path)
+            stub.requests.append((self.command, self.path, dict(self.headers), json.loads(body) if body else None))
+            kind, *args = stub.responses.pop(0) if stub.responses else ("status", 500)
+        getattr(self, f"_{kind}")(*args)
+
+    do_DELETE = do_POST
+
+    def _status(self, status, body=b'{"error": {}}', headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items(): self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _text(self, text):
+        self._status(200, json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}).encode())
+
+    def _hang(self, seconds):
+        # 클라이언트 timeout보다 길게 응답하지 않습니다.
+        time.sleep(seconds)
+        self.close_connection = True
+
+    def _truncate(self, status=200):
+        # 알린 chunk 크기보다 짧게 보내고 연결을 끊습니다 (본문을 읽다가 ChunkedEncodingError).
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.write(b"40\r\n{\"candidates\": [")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _sse(self, name):
+        with open(os.path.join(FIXTURES, name), "rb") as f: data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(data), REPLAY_CHUNK_BYTES):
+            piece = data[i:i + REPLAY_CHUNK_BYTES]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class GeminiStub:
+    """responses에 넣은 순서대로 응답하는 로컬 Gemini. 다 쓰면 500입니다.
+
+    ("status", 코드[, 본문, 헤더])는 그 상태 코드를, ("text", 텍스트)는 generateContent 성공 응답을,
+    ("hang", 초)는 그동안 응답하지 않다 끊기(타임아웃)를, ("truncate",)는 중간에 끊긴 본문을,
+    ("sse", 파일명)은 tests/fixtures의 녹화된 SSE 스트림을 재생합니다.
+    받은 요청은 paths(경로)와 requests((메서드, 경로, 헤더, JSON 본문))에 순서대로 남습니다.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.paths = []
+        self.requests = []
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.base = f"http://127.0.0.1:{self._server.server_port}/v1beta"
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="gemini-stub").start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def gemini_stub(monkeypatch):
+    import gemini_client
+    stub = GeminiStub()
+    monkeypatch.setattr(gemini_client, "GEMINI_API_BASE", stub.base)
+    yield stub
+    stub.close()
@@ -0,0 +1,153 @@
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from auth_store import AuthStore, parse_auth_csv
+
+WAIT = 5
+
+
+# --- parse_auth_csv: 예전 pandas 파서와 같은 결과 ---
+
+def pandas_parse(text):
+    """user-001 이전 app.load_auth_data의 파싱 부분 그대로."""
+    pd = pytest.importorskip("pandas")
+    df = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False)
+    df.columns = df.columns.astype(str).str.strip()
+    code_col = next((c for c in df.columns if '코드' in c or '입사일' in c), None)
+    name_col = next((c for c in df.columns if '성명' in c or '이름' in c or '면접관' in c and c != code_col), None)
+    if not code_col or not name_col: return {}
+    codes = df[code_col].str.replace(r'\s+', '', regex=True).str.replace(',', '', regex=False).str.replace(r'\.0*$', '', regex=True)
+    names = df[name_col].str.replace(r'\s+', '', regex=True)
+    return {c: n for c, n in zip(codes, names) if c}
+
+
+@pytest.mark.parametrize("text", [
+    '﻿면접관 성명,인증 코드\n홍 길동,"1,234"\n김철수, 5678.0 \n,\n이영희,\n',
+    '번호,이름,입사일\n1,홍길동,20200101\n2,김 철수,20210101.00\n\n3,박,\n',
+    '면접관,코드\n"A, B",1\n"줄\n바꿈",2\n',
+    '"  성명  ","코드 "\n홍,12\n김,12\n',
+    '이름,기타\n홍,1\n',
+    '',
+])
+def test_parse_matches_pandas_parser(text):
+    assert parse_auth_csv(text) == (pandas_parse(text) if text else {})
+
+
+def test_parse_keeps_valid_rows_when_a_row_is_ragged():
+    # pandas는 열 개수가 다른 줄이 있으면 예외를 내서 전체가 빈 인덱스가 됐습니다.
+    assert parse_auth_csv('성명,코드\n홍\n김,3,extra\n') == {'3': '김'}
+
+
+# --- AuthStore (로컬 시트 서버) ---
+
+class Sheet:
+    """csv를 돌려주는 로컬 시트. status/delay를 바꿔 장애를 흉내내고, 받은 요청 수를 셉니다."""
+
+    def __init__(self, csv):
+        self.csv, self.status, self.delay, self.hits = csv, 200, 0, 0
+        sheet = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+            def do_GET(self):
+                sheet.hits += 1
+                time.sleep(sheet.delay)
+                body = sheet.csv.encode()
+                self.send_response(sheet.status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}/sheet.csv?sheet=t"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def sheet():
+    s = Sheet("성명,코드\n홍길동,1111\n")
+    yield s
+    s.close()
+
+
+def wait_for(cond):
+    end = time.time() + WAIT
+    while time.time() < end:
+        if cond(): return
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_first_lookup_loads_and_later_lookups_do_no_io(sheet, tmp_path):
+    store = AuthStore(sheet.url, snapshot_path=str(tmp_path / "snap.json"))
+    assert store.lookup("1111") == "홍길동" and store.lookup("2222") is None
+    assert sheet.hits == 1
+
+
+def test_stale_index_is_served_while_revalidating(sheet, tmp_path):
+    store = AuthStore(sheet.url, ttl=0.05, snapshot_path=str(tmp_path / "snap.json"))
+    store.lookup("1111")
+    sheet.csv, sheet.delay = "성명,코드\n김철수,2222\n", 0.3
+    time.sleep(0.1)
+    started = time.time()
+    assert store.lookup("1111") == "홍길동"
+    assert time.time() - started < 0.2
+    wait_for(lambda: store.lookup("2222") == "김철수")
+
+
+def test_failed_refresh_keeps_previous_index(sheet, tmp_path):
+    store = AuthStore(sheet.url, min_force_interval=0, failure_backoff=0, snapshot_path=str(tmp_path / "snap.json"))
+    store.lookup("1111")
+    sheet.status = 500
+    assert not store.refresh(force=True)
+    assert store.lookup("1111") == "홍길동"
+
+
+def test_snapshot_is_used_when_sheet_is_down(sheet, tmp_path):
+    path = str(tmp_path / "snap.json")
+    AuthStore(sheet.url, snapshot_path=path).lookup("1111")
+    sheet.status = 500
+    hits = sheet.hits
+    store = AuthStore(sheet.url, snapshot_path=path)
+    assert store.lookup("1111") == "홍길동"
+    assert sheet.hits == hits
+
+
+def test_forced_refresh_is_throttled_from_last_attempt_while_sheet_is_down(sheet, tmp_path):
+    store = AuthStore(sheet.url, min_force_interval=0.2, failure_backoff=0, snapshot_path=str(tmp_path / "snap.json"))
+    store.lookup("1111")
+    time.sleep(0.25)
+    sheet.status = 500
+    assert not store.refresh(force=True)
+    assert sheet.hits == 2
+    # 마지막 성공은 간격보다 오래됐지만, 방금 시도했으므로 다시 부르지 않습니다.
+    assert not store.refresh(force=True)
+    assert sheet.hits == 2
+
+
+def test_forced_refresh_is_skipped_while_backing_off(sheet, tmp_path):
+    store = AuthStore(sheet.url, min_force_interval=0, failure_backoff=30, snapshot_path=str(tmp_path / "snap.json"))
+    store.lookup("1111")
+    sheet.status = 500
+    assert not store.refresh(force=True)
+    hits = sheet.hits
+    assert not store.refresh(force=True)
+    assert sheet.hits == hits
+
+
+def test_forced_refresh_does_not_wait_for_refresh_in_flight(sheet, tmp_path):
+    store = AuthStore(sheet.url, ttl=0, min_force_interval=0, snapshot_path=str(tmp_path / "snap.json"))
+    store.lookup("1111")
+    sheet.delay = 0.5
+    store.lookup("1111")
+    wait_for(lambda: store._refreshing)
+    started = time.time()
+    assert not store.refresh(force=True)
+    assert time.time() - started < 0.2
@@ -0,0 +1,141 @@
+import threading
+import time
+import traceback
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_client
+import question_gen
+from context_cache import ContextCache
+from gemini_client import GeminiClient, GeminiError
+
+WAIT = 5
+SECRET = "AIzaSECRETKEY123"
+CREATED = ("status", 200, b'{"name": "cachedContents/abc", "usageMetadata": {"totalTokenCount": 4096}}')
+
+
+def build():
+    return {"parts": [{"text": "지침"}]}, [{"role": "user", "parts": [{"text": "[JD 내용]\nJD"}]}]
+
+
+def wait_for(cond):
+    end = time.time() + WAIT
+    while time.time() < end:
+        value = cond()
+        if value: return value
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def entry(cache, owner="s1", key="k"):
+    return cache._owners.get(owner, {}).get(key)
+
+
+# --- ContextCache (로컬 가짜 서버로 cachedContents 생성/삭제) ---
+
+def test_creates_cache_in_background_and_sends_key_in_header(gemini_stub):
+    cache = ContextCache(ttl=600)
+    h = cache.handle("s1", "k", SECRET, build)
+    assert h.name() is None
+    gemini_stub.responses.append(CREATED)
+    assert wait_for(h.name) == "cachedContents/abc"
+    method, path, headers, body = gemini_stub.requests[0]
+    assert (method, path) == ("POST", "/v1beta/cachedContents")
+    assert headers["x-goog-api-key"] == SECRET
+    assert body["ttl"] == "600s" and body["systemInstruction"] == build()[0] and body["contents"] == build()[1]
+    # 준비된 뒤에는 다시 만들지 않습니다.
+    assert h.name() == "cachedContents/abc" and len(gemini_stub.requests) == 1
+
+
+def test_uncacheable_input_is_not_retried_within_ttl(gemini_stub):
+    cache = ContextCache(ttl=600, negative_ttl=1)
+    gemini_stub.responses.append(("status", 400))
+    h = cache.handle("s1", "k", "key", build)
+    assert h.name() is None
+    wait_for(lambda: entry(cache)["status"] == "error")
+    assert entry(cache)["retry_at"] > time.time() + 500
+    assert h.name() is None and len(gemini_stub.requests) == 1
+
+
+def test_release_deletes_server_side_cache(gemini_stub):
+    cache = ContextCache()
+    gemini_stub.responses.append(CREATED)
+    h = cache.handle("s1", "k", SECRET, build)
+    h.name()
+    wait_for(h.name)
+    gemini_stub.responses.append(("status", 200, b"{}"))
+    cache.release("s1")
+    method, path, headers, _ = wait_for(lambda: next((r for r in gemini_stub.requests if r[0] == "DELETE"), None))
+    assert path == "/v1beta/cachedContents/abc" and headers["x-goog-api-key"] == SECRET
+    assert entry(cache) is None
+
+
+def test_release_while_creating_deletes_the_late_cache(gemini_stub):
+    cache, released = ContextCache(), threading.Event()
+    def slow_build():
+        released.wait(WAIT)
+        return build()
+    gemini_stub.responses += [CREATED, ("status", 200, b"{}")]
+    cache.handle("s1", "k", "key", slow_build).name()
+    cache.release("s1")
+    released.set()
+    _, path, _, _ = wait_for(lambda: next((r for r in gemini_stub.requests if r[0] == "DELETE"), None))
+    assert path == "/v1beta/cachedContents/abc" and entry(cache) is None
+
+
+# --- _generate: 캐시가 서버에서 사라졌으면 전체 payload로 다시 보냅니다 ---
+
+class FakeContext:
+    def __init__(self, name): self._name, self.invalidated = name, []
+    def name(self): return self._name
+    def invalidate(self, name): self.invalidated.append(name)
+
+
+RESUME = SimpleNamespace(name="resume.jpg", getvalue=lambda: b"\xff\xd8resume")
+
+
+@pytest.mark.parametrize("status", [400, 403, 404])
+def test_generate_falls_back_to_full_payload_when_cache_is_gone(gemini_stub, status):
+    gemini_stub.responses += [("status", status), ("text", "ok")]
+    ctx = FakeContext("cachedContents/gone")
+    assert question_gen._generate("key", "프롬프트", "JD", RESUME, None, None, ctx) == "ok"
+    first, second = gemini_stub.requests[0][3], gemini_stub.requests[1][3]
+    assert first["cachedContent"] == "cachedContents/gone" and "systemInstruction" not in first
+    assert "cachedContent" not in second and second["systemInstruction"]
+    assert any("[JD 내용]" in part.get("text", "") for part in second["contents"][0]["parts"])
+    assert ctx.invalidated == ["cachedContents/gone"]
+
+
+def test_generate_does_not_fall_back_on_other_errors(gemini_stub):
+    gemini_stub.responses += [("status", 401), ("text", "ok")]
+    ctx = FakeContext("cachedContents/abc")
+    with pytest.raises(GeminiError) as e: question_gen._generate("key", "프롬프트", "JD", RESUME, None, None, ctx)
+    assert e.value.status == 401 and ctx.invalidated == [] and len(gemini_stub.requests) == 1
+
+
+def test_generate_uses_cache_handle_when_ready(gemini_stub):
+    gemini_stub.responses.append(("text", "ok"))
+    question_gen._generate("key", "프롬프트", "JD", RESUME, None, None, FakeContext("cachedContents/abc"))
+    body = gemini_stub.requests[0][3]
+    assert body["cachedContent"] == "cachedContents/abc" and body["contents"] == [{"role": "user", "parts": [{"text": "프롬프트"}]}]
+
+
+# --- API 키가 URL/예외/로그에 남지 않아야 합니다 ---
+
+def test_generate_sends_key_in_header_not_url(gemini_stub):
+    gemini_stub.responses.append(("text", "ok"))
+    GeminiClient().generate(SECRET, {})
+    _, path, headers, _ = gemini_stub.requests[0]
+    assert SECRET not in path and headers["x-goog-api-key"] == SECRET
+
+
+@pytest.mark.parametrize("call", [
+    lambda c: c.create_cached_content(SECRET, {}, timeout=1),
+    lambda c: c.delete_cached_content(SECRET, "cachedContents/x", timeout=1),
+])
+def test_connection_error_does_not_leak_key(monkeypatch, call):
+    monkeypatch.setattr(gemini_client, "GEMINI_API_BASE", "http://127.0.0.1:9/v1beta")
+    with pytest.raises(GeminiError) as e: call(GeminiClient())
+    assert e.value.status == 0
+    assert SECRET not in "".join(traceback.format_exception(e.value))
@@ -0,0 +1,181 @@
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_client
+from gemini_client import CircuitBreaker, CircuitOpenError, GeminiClient, GeminiError, retry_hint
+
+
+class FakeClock:
+    def __init__(self): self.now = 1000.0
+    def time(self): return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(gemini_client, "time", c)
+    return c
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_threshold_failures(clock):
+    b = CircuitBreaker(threshold=2, reset_timeout=30)
+    b.check(); b.record_failure()
+    b.check(); b.record_failure()
+    with pytest.raises(CircuitOpenError) as e: b.check()
+    assert e.value.retry_in == 30 and e.value.status == 429
+
+
+def test_success_resets_failure_count(clock):
+    b = CircuitBreaker(threshold=2, reset_timeout=30)
+    b.record_failure(); b.record_success(); b.record_failure()
+    b.check()
+
+
+def test_half_open_allows_a_single_trial(clock):
+    b = CircuitBreaker(threshold=1, reset_timeout=30)
+    b.record_failure()
+    clock.now += 31
+    b.check()
+    with pytest.raises(CircuitOpenError): b.check()
+
+
+def test_half_open_trial_success_closes(clock):
+    b = CircuitBreaker(threshold=1, reset_timeout=30)
+    b.record_failure()
+    clock.now += 31
+    b.check(); b.record_success()
+    b.check(); b.check()
+
+
+def test_half_open_trial_failure_reopens(clock):
+    b = CircuitBreaker(threshold=1, reset_timeout=30)
+    b.record_failure()
+    clock.now += 31
+    b.check(); b.record_failure()
+    with pytest.raises(CircuitOpenError) as e: b.check()
+    assert e.value.retry_in == 30
+    clock.now += 31
+    b.check()
+
+
+def test_retry_hint_extends_open_period(clock):
+    b = CircuitBreaker(threshold=1, reset_timeout=30)
+    b.record_failure(hint=90)
+    clock.now += 60
+    with pytest.raises(CircuitOpenError) as e: b.check()
+    assert e.value.retry_in == 30
+
+
+# --- retry_hint ---
+
+def response(headers=None, body=None):
+    def json():
+        if body is None: raise ValueError("not json")
+        return body
+    return SimpleNamespace(headers=headers or {}, json=json)
+
+
+@pytest.mark.parametrize("res, expected", [
+    (response({"Retry-After": "7"}), 7.0),
+    (response({"Retry-After": "-3"}), 0.0),
+    (response({}, {"error": {"details": [{"@type": "RetryInfo", "retryDelay": "13s"}]}}), 13.0),
+    (response({"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}, {"error": {"details": [{"retryDelay": "2.5s"}]}}), 2.5),
+    (response({}, {"error": {"details": [{"@type": "ErrorInfo"}]}}), None),
+    (response({}, ["not", "a", "dict"]), None),
+    (response({}), None),
+])
+def test_retry_hint(res, expected):
+    assert retry_hint(res) == expected
+
+
+# --- GeminiClient (로컬 가짜 서버로 429/500/타임아웃 주입) ---
+
+def client(**kwargs):
+    return GeminiClient(**{"max_attempts": 3, "base_delay": 0.01, "max_delay": 0.05, "breaker_threshold": 3, "breaker_reset": 30, **kwargs})
+
+
+def test_retries_429_with_retry_after_then_succeeds(gemini_stub):
+    gemini_stub.responses += [("status", 429, b'{"error": {}}', {"Retry-After": "0"}), ("text", "ok")]
+    assert client().generate("key", {}) == "ok"
+    assert len(gemini_stub.paths) == 2
+
+
+def test_gives_up_after_max_attempts_on_500(gemini_stub):
+    gemini_stub.responses += [("status", 500)] * 3
+    with pytest.raises(GeminiError) as e: client().generate("key", {})
+    assert e.value.status == 500 and len(gemini_stub.paths) == 3
+
+
+def test_client_error_is_not_retried_and_keeps_breaker_closed(gemini_stub):
+    c = client(breaker_threshold=1)
+    gemini_stub.responses += [("status", 400), ("text", "ok")]
+    with pytest.raises(GeminiError) as e: c.generate("key", {})
+    assert e.value.status == 400 and len(gemini_stub.paths) == 1
+    assert c.generate("key", {}) == "ok"
+
+
+def test_timeout_is_retried(gemini_stub):
+    gemini_stub.responses += [("hang", 1.0), ("text", "ok")]
+    assert client().generate("key", {}, timeout=0.2) == "ok"
+
+
+def test_open_breaker_fails_fast_without_calling(gemini_stub):
+    c = client(max_attempts=1, breaker_threshold=2)
+    gemini_stub.responses += [("status", 500), ("status", 500)]
+    for _ in range(2):
+        with pytest.raises(GeminiError): c.generate("key", {})
+    with pytest.raises(CircuitOpenError): c.generate("key", {})
+    assert len(gemini_stub.paths) == 2
+    # 다른 API 키는 영향을 받지 않습니다.
+    gemini_stub.responses.append(("text", "ok"))
+    assert c.generate("other", {}) == "ok"
+
+
+def test_truncated_body_during_half_open_trial_does_not_wedge_breaker(gemini_stub):
+    c = client(max_attempts=1, breaker_threshold=1, breaker_reset=0.05)
+    gemini_stub.responses += [("status", 500), ("truncate",), ("text", "ok")]
+    with pytest.raises(GeminiError): c.generate("key", {})
+    c.breaker("key")._open_until = 0
+    with pytest.raises(GeminiError) as e: c.generate("key", {})
+    assert e.value.status == 0 and not isinstance(e.value, CircuitOpenError)
+    c.breaker("key")._open_until = 0
+    assert c.generate("key", {}) == "ok"
+
+
+def test_limit_rate_spaces_out_every_attempt(gemini_stub):
+    c = client()
+    c.limit_rate("key", calls_per_minute=600, burst=1)
+    gemini_stub.responses += [("status", 500), ("text", "ok"), ("text", "ok")]
+    started = gemini_client.time.time()
+    assert c.generate("key", {}) == "ok"
+    assert c.generate("key", {}) == "ok"
+    # 3번의 HTTP 호출(재시도 포함) 사이마다 0.1초씩 기다립니다.
+    assert gemini_client.time.time() - started >= 0.18
+
+
+def test_limit_rate_gives_up_when_turn_is_past_deadline(gemini_stub):
+    c = client()
+    c.limit_rate("key", calls_per_minute=1, burst=1)
+    gemini_stub.responses += [("text", "ok")]
+    assert c.generate("key", {}) == "ok"
+    with pytest.raises(GeminiError) as e: c.generate("key", {}, deadline=1)
+    assert e.value.status == 0 and len(gemini_stub.paths) == 1
+
+
+@pytest.mark.parametrize("body", [
+    b'{"candidates": [{"finishReason": "SAFETY"}], "promptFeedback": {"blockReason": "SAFETY"}}',
+    b'{"candidates": [{"content": {"role": "model"}, "finishReason": "MAX_TOKENS"}]}',
+    b'{"promptFeedback": {"blockReason": "OTHER"}}',
+    b'not json',
+])
+def test_response_without_text_part_is_empty_text(gemini_stub, body):
+    gemini_stub.responses.append(("status", 200, body))
+    assert client().generate("key", {}) == ""
+
+
+def test_multiple_text_parts_are_joined(gemini_stub):
+    gemini_stub.responses.append(("status", 200, b'{"candidates": [{"content": {"parts": [{"text": "[{\\"q\\""}, {"text": ": 1}]"}]}}]}'))
+    assert client().generate("key", {}) == '[{"q": 1}]'
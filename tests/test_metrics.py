@@ -0,0 +1,14 @@
+import socket
+
+import metrics
+
+
+def test_exporter_survives_port_in_use(tmp_path):
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        before = sum(metrics.counter_totals("errors_total").values())
+        metrics.start_exporter(path=str(tmp_path / "metrics.prom"), interval=3600, port=busy.getsockname()[1])
+    errors = metrics.counter_totals("errors_total")
+    assert sum(errors.values()) == before + 1
+    assert (("error", "OSError"), ("stage", "metrics_http")) in errors
@@ -0,0 +1,118 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import batch
+import question_gen
+from gemini_client import GeminiError
+from question_gen import (CATEGORIES, QUESTIONS_PER_CATEGORY, is_complete, parse_all_questions, parse_category_questions,
+                          request_all_questions, request_category_questions)
+
+RESUME = SimpleNamespace(name="resume.jpg", getvalue=lambda: b"\xff\xd8resume")
+
+
+def qs(prefix, n):
+    return [{"q": f"{prefix} {i}", "i": "의도"} for i in range(n)]
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """generate_text 대신 넣어 둔 응답을 순서대로 돌려주고, 받은 프롬프트를 prompts에 남깁니다. 예외를 넣으면 올립니다."""
+    state = SimpleNamespace(queue=[], prompts=[])
+    def fake(api_key, payload, **kwargs):
+        state.prompts.append(payload["contents"][0]["parts"][0]["text"])
+        reply = state.queue.pop(0)
+        if isinstance(reply, Exception): raise reply
+        return reply
+    monkeypatch.setattr(question_gen, "generate_text", fake)
+    return state
+
+
+# --- 파싱 ---
+
+def test_parse_all_strict_fills_missing_categories():
+    result, strict = parse_all_questions(json.dumps({"Transform": qs("T", 2), "Other": qs("X", 1)}))
+    assert strict and result == {"Transform": qs("T", 2), "Tomorrow": [], "Together": []}
+
+
+def test_parse_all_salvages_complete_objects_from_truncated_json():
+    text = json.dumps({"Transform": qs("T", 2), "Tomorrow": qs("M", 1)}, ensure_ascii=False)
+    result, strict = parse_all_questions(text[:text.rindex("}") - 3])
+    assert not strict and result == {"Transform": qs("T", 2), "Tomorrow": [], "Together": []}
+
+
+def test_parse_category_unwraps_and_cleans():
+    items, strict = parse_category_questions('```json\n{"questions": [{"q": " 질문 ", "i": 3}, {"q": ""}, "x"]}\n```')
+    assert strict and items == [{"q": "질문", "i": "3"}]
+
+
+def test_is_complete():
+    assert is_complete({cat: qs(cat, QUESTIONS_PER_CATEGORY) for cat in CATEGORIES})
+    assert not is_complete({**{cat: qs(cat, QUESTIONS_PER_CATEGORY) for cat in CATEGORIES}, "Together": []})
+    assert not is_complete({"Transform": qs("T", 5)}) and not is_complete(None)
+
+
+# --- 전체 생성: 건진 질문은 살리고 모자란 역량만 복구 ---
+
+def test_all_repairs_only_short_categories(replies):
+    full = json.dumps({"Transform": qs("T", 5), "Tomorrow": qs("M", 2)}, ensure_ascii=False)
+    replies.queue += [full[:full.rindex("]")], json.dumps(qs("M+", 3)), json.dumps(qs("G", 5))]
+    result = request_all_questions("key", "IC-L4", RESUME, "JD")
+    assert result == {"Transform": qs("T", 5), "Tomorrow": qs("M", 2) + qs("M+", 3), "Together": qs("G", 5)}
+    assert is_complete(result)
+    # 복구 요청은 이미 있는 질문을 피하라고 알려줍니다.
+    assert "[Value] Tomorrow" in replies.prompts[1] and "M 0" in replies.prompts[1] and "3개" in replies.prompts[1]
+
+
+def test_all_failed_repair_keeps_salvaged_questions_but_is_incomplete(replies):
+    replies.queue += [json.dumps({"Transform": qs("T", 5), "Tomorrow": qs("M", 5)}), GeminiError(500)]
+    result = request_all_questions("key", "IC-L4", RESUME, "JD")
+    assert result == {"Transform": qs("T", 5), "Tomorrow": qs("M", 5), "Together": []}
+    assert not is_complete(result)
+
+
+def test_all_retries_whole_call_once_when_nothing_parses(replies):
+    replies.queue += ["죄송합니다", "여전히 아님"]
+    assert request_all_questions("key", "IC-L4", RESUME, "JD") is None
+    assert len(replies.prompts) == 2
+
+
+# --- 역량별 생성 ---
+
+def test_category_repair_drops_duplicates(replies):
+    replies.queue += [json.dumps(qs("T", 3)), json.dumps(qs("T", 1) + qs("N", 2))]
+    assert request_category_questions("key", "Transform", "IC-L4", RESUME, "JD", count=5) == qs("T", 3) + qs("N", 2)
+
+
+def test_category_failed_repair_returns_fewer_items(replies):
+    replies.queue += [json.dumps(qs("T", 3)), GeminiError(503)]
+    assert request_category_questions("key", "Transform", "IC-L4", RESUME, "JD", count=5) == qs("T", 3)
+
+
+# --- 일괄 생성: 모자란 결과는 캐시하지 않고 실패로 남깁니다 ---
+
+class DictCache(dict):
+    def put(self, key, value): self[key] = value
+
+
+ENTRY = {"candidate": "c", "level": "IC-L4", "jd_url": "JD 본문", "feedback": ""}
+FETCHER = SimpleNamespace(result=lambda url: None)
+
+
+def test_batch_incomplete_result_is_not_cached(monkeypatch):
+    partial = {"Transform": qs("T", 5), "Tomorrow": qs("M", 5), "Together": []}
+    monkeypatch.setattr(batch, "request_all_questions", lambda *a, **k: partial)
+    cache = DictCache()
+    with pytest.raises(ValueError, match="Together 0/5"):
+        batch.generate_entry(ENTRY, RESUME, None, "key", FETCHER, cache)
+    assert not cache
+
+
+def test_batch_ignores_incomplete_cached_result(monkeypatch):
+    complete = {cat: qs(cat, 5) for cat in CATEGORIES}
+    monkeypatch.setattr(batch, "request_all_questions", lambda *a, **k: complete)
+    key = question_gen.question_cache_key("all", "IC-L4", RESUME, "JD 본문", "", None)
+    cache = DictCache({key: {**complete, "Together": []}})
+    assert batch.generate_entry(ENTRY, RESUME, None, "key", FETCHER, cache) == (complete, False)
+    assert cache[key] == complete
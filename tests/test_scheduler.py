@@ -0,0 +1,178 @@
+import threading
+
+import pytest
+
+import scheduler
+from scheduler import GenerationScheduler, TokenBucket
+
+WAIT = 5
+
+
+class FakeClock:
+    def __init__(self): self.now = 100.0
+    def monotonic(self): return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(scheduler, "time", c)
+    return c
+
+
+@pytest.fixture
+def sched():
+    # 호출 수 한도는 넉넉히 두고, 동시 실행 수만으로 순서를 봅니다.
+    return GenerationScheduler(max_workers=4, max_concurrent_per_key=1, calls_per_minute=6000, burst=100)
+
+
+def job(log, name, done=None):
+    def fn(on_item=None):
+        log.append(name)
+        if done: done.wait(WAIT)
+        return name
+    return fn
+
+
+def occupy(s, api_key="key"):
+    """키의 실행 슬롯 하나를 release.set() 할 때까지 붙잡습니다."""
+    started, release = threading.Event(), threading.Event()
+    def fn(on_item=None):
+        started.set()
+        release.wait(WAIT)
+    fut = s.submit("blocker", api_key, "blocker-session", fn)
+    assert started.wait(WAIT)
+    return fut, release
+
+
+# --- TokenBucket ---
+
+def test_bucket_allows_burst_then_reports_wait(clock):
+    b = TokenBucket(rate=0.5, capacity=2)
+    assert b.take() == 0 and b.take() == 0
+    assert b.take() == pytest.approx(2.0)
+    clock.now += 2
+    assert b.take() == 0
+
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    b = TokenBucket(rate=1, capacity=2)
+    clock.now += 1000
+    assert [b.take() for _ in range(3)] == [0, 0, pytest.approx(1.0)]
+
+
+def test_bucket_reserve_keeps_tokens_back(clock):
+    b = TokenBucket(rate=1, capacity=3)
+    assert b.take(reserve=2) == 0
+    assert b.take(reserve=2) == pytest.approx(1.0)
+    assert b.take() == 0 and b.take() == 0
+
+
+# --- 대기열 순서 ---
+
+def test_round_robin_between_sessions_matches_reported_position(sched):
+    blocker, release = occupy(sched)
+    log, futs = [], {}
+    for session, names in [("A", ["A1", "A2", "A3"]), ("B", ["B1", "B2"]), ("C", ["C1"])]:
+        for name in names: futs[name] = sched.submit(name, "key", session, job(log, name))
+    ahead = {name: sched.status(f) for name, f in futs.items()}
+    assert all(state == "queued" for state, _ in ahead.values())
+    assert sched.queue_depth("key") == (1, 6)
+
+    release.set()
+    for f in futs.values(): f.result(WAIT)
+    assert log == ["A1", "B1", "C1", "A2", "B2", "A3"]
+    assert {name: log.index(name) for name in futs} == {name: n for name, (_, n) in ahead.items()}
+
+
+def test_keys_are_limited_independently(sched):
+    _, release = occupy(sched, "key")
+    log = []
+    assert sched.submit("other", "other-key", "A", job(log, "other")).result(WAIT) == "other"
+    release.set()
+
+
+# --- single-flight / 취소 ---
+
+def test_same_key_same_request_runs_once(sched):
+    _, release = occupy(sched)
+    log = []
+    first = sched.submit("same", "key", "A", job(log, "same"))
+    second = sched.submit("same", "key", "B", job(log, "same-again"))
+    release.set()
+    assert first.result(WAIT) == second.result(WAIT) == "same"
+    assert log == ["same"]
+
+
+def test_different_api_keys_do_not_share_a_call(sched):
+    log, done = [], threading.Event()
+    a = sched.submit("same", "key-a", "A", job(log, "a", done))
+    b = sched.submit("same", "key-b", "B", job(log, "b", done))
+    done.set()
+    assert (a.result(WAIT), b.result(WAIT)) == ("a", "b")
+
+
+def test_cancel_removes_job_only_when_nobody_waits(sched):
+    _, release = occupy(sched)
+    log = []
+    first = sched.submit("shared", "key", "A", job(log, "shared"))
+    second = sched.submit("shared", "key", "B", job(log, "unused"))
+    assert first.cancel()
+    assert sched.queue_depth("key") == (1, 1)
+    assert second.cancel()
+    assert sched.queue_depth("key") == (1, 0)
+    # 지워진 뒤 같은 요청은 새로 예약됩니다.
+    again = sched.submit("shared", "key", "A", job(log, "again"))
+    release.set()
+    assert again.result(WAIT) == "again"
+    assert log == ["again"]
+
+
+def test_streamed_items_are_replayed_to_late_joiners(sched):
+    joined, finish = threading.Event(), threading.Event()
+    def fn(on_item=None):
+        on_item("Transform", {"q": "1"})
+        joined.wait(WAIT)
+        on_item("Transform", {"q": "2"})
+        finish.wait(WAIT)
+        return "done"
+    early, late, first_item = [], [], threading.Event()
+    first = sched.submit("stream", "key", "A", fn, on_item=lambda k, o: (early.append(o["q"]), first_item.set()))
+    assert first_item.wait(WAIT)
+    second = sched.submit("stream", "key", "B", fn, on_item=lambda k, o: late.append(o["q"]))
+    joined.set(); finish.set()
+    assert first.result(WAIT) == second.result(WAIT) == "done"
+    assert early == late == ["1", "2"]
+
+
+# --- background 요청 ---
+
+def test_background_waits_for_a_spare_slot_and_is_promoted_when_joined():
+    s = GenerationScheduler(max_workers=4, max_concurrent_per_key=2, calls_per_minute=6000, burst=100)
+    _, release = occupy(s)
+    log = []
+    spare = s.submit("spare", "key", "A", job(log, "spare"), background=True)
+    # 실행 슬롯 하나를 남겨 두어야 하므로 나가지 않습니다.
+    assert s.status(spare) == ("queued", 0)
+    assert not log
+    # 사용자가 같은 요청을 직접 기다리면 일반 요청으로 올라가 남은 슬롯으로 바로 나갑니다.
+    joined = s.submit("spare", "key", "B", job(log, "joined"))
+    assert joined.result(WAIT) == spare.result(WAIT) == "spare"
+    assert log == ["spare"]
+    release.set()
+
+
+def test_background_counts_behind_foreground_queue(sched):
+    _, release = occupy(sched)
+    log = []
+    spare = sched.submit("spare", "key", "A", job(log, "spare"), background=True)
+    fg = sched.submit("fg", "key", "B", job(log, "fg"))
+    assert sched.status(spare) == ("queued", 1)
+    release.set()
+    fg.result(WAIT)
+    assert log == ["fg"]
+
+
+def test_background_runs_when_key_is_idle():
+    s = GenerationScheduler(max_workers=4, max_concurrent_per_key=2, calls_per_minute=6000, burst=100)
+    assert s.submit("spare", "key", "A", job([], "spare"), background=True).result(WAIT) == "spare"
@@ -0,0 +1,66 @@
+import json
+
+from gemini_client import GeminiClient, QuestionStreamParser
+
+CATEGORIES = ["Transform", "Tomorrow", "Together"]
+
+
+def feed_in_pieces(text, size):
+    parser, out = QuestionStreamParser(), []
+    for i in range(0, len(text), size): out += parser.feed(text[i:i + size])
+    return out
+
+
+def test_emits_each_question_with_its_category():
+    data = {cat: [{"q": f"{cat} 질문 {n}", "i": "의도"} for n in range(2)] for cat in CATEGORIES}
+    items = QuestionStreamParser().feed(json.dumps(data, ensure_ascii=False))
+    assert [(key, obj["q"]) for key, obj in items] == [(cat, f"{cat} 질문 {n}") for cat in CATEGORIES for n in range(2)]
+
+
+def test_result_does_not_depend_on_chunk_boundaries():
+    data = {cat: [{"q": f'{cat} "인용" {{중괄호}} [대괄호] \\ 끝', "i": "줄\n바꿈"}] for cat in CATEGORIES}
+    text = json.dumps(data, ensure_ascii=False)
+    expected = QuestionStreamParser().feed(text)
+    assert len(expected) == 3
+    for size in range(1, 12):
+        assert feed_in_pieces(text, size) == expected
+
+
+def test_escapes_and_brackets_inside_strings():
+    text = r'[{"q": "그는 \"}]\" 라고 했나요? \\", "i": "{\"nested\": [1]}"}, {"q": "두 번째", "i": ""}]'
+    items = feed_in_pieces(text, 1)
+    assert [obj for _, obj in items] == [{"q": '그는 "}]" 라고 했나요? \\', "i": '{"nested": [1]}'}, {"q": "두 번째", "i": ""}]
+    assert all(key is None for key, _ in items)
+
+
+def test_ignores_code_fence_and_trailing_text():
+    text = '```json\n[{"q": "질문", "i": "의도"}]\n```\n[{"q": "무시", "i": ""}]'
+    assert QuestionStreamParser().feed(text) == [(None, {"q": "질문", "i": "의도"})]
+
+
+def test_skips_objects_without_question():
+    assert QuestionStreamParser().feed('[{"i": "의도만"}, {"q": "질문", "i": ""}]') == [(None, {"q": "질문", "i": ""})]
+
+
+def test_wrapper_object_reports_wrapper_key():
+    items = QuestionStreamParser().feed('{"questions": [{"q": "질문", "i": "의도"}]}')
+    assert items == [("questions", {"q": "질문", "i": "의도"})]
+
+
+# --- 녹화된 SSE 스트림 재생 (tests/fixtures/*.sse) ---
+
+def test_replay_all_questions_stream(gemini_stub):
+    gemini_stub.responses.append(("sse", "all_questions.sse"))
+    seen = []
+    text = GeminiClient().generate("key", {}, on_item=lambda cat, q: seen.append((cat, q)))
+    assert ":streamGenerateContent" in gemini_stub.paths[0] and "alt=sse" in gemini_stub.paths[0]
+    data = json.loads(text)
+    assert seen == [(cat, q) for cat in CATEGORIES for q in data[cat]]
+    assert '{"replicas": 3}' in data["Transform"][1]["q"] and "C:\\\\work" in data["Transform"][2]["q"]
+
+
+def test_replay_wrapped_category_stream_uses_requested_category(gemini_stub):
+    gemini_stub.responses.append(("sse", "category_wrapped.sse"))
+    seen = []
+    GeminiClient().generate("key", {}, on_item=lambda cat, q: seen.append(cat), default_key="Tomorrow")
+    assert seen == ["Tomorrow"] * 3